@@ -6,32 +6,78 @@ GITHUB = {
     "DEFAULT_DESCRIPTION": "A new Farcaster frameception project",
 }
 
+# the first Vercel build is the commit with this message, see VERCEL_CONFIG["IGNORE_BUILD_CMD"]
+DEPLOYMENT_COMPLETE_COMMIT_MESSAGE = "Deployment complete"
+
 APP_NAME = "frameception"
 MODAL_UPDATE_CODE_FUNCTION_NAME = "update_code"
 MODAL_SETUP_PROJECT_FUNCTION_NAME = "setup_project"
 MODAL_DEPLOY_PROJECT_FUNCTION_NAME = "deploy_project"
+MODAL_WATCH_DEPLOYMENT_FUNCTION_NAME = "watch_vercel_deployment"
+MODAL_UPDATE_CONTEXT_INDEX_FUNCTION_NAME = "update_context_index"
 
 TIMEOUTS = {
     "CODE_UPDATE": 1200,  # 20 mins
     "PROJECT_SETUP": 3600,  # 1 hour
     "BUILD": 600,  # 10 mins
+    "SANDBOX": 1800,  # 30 mins, covers an Aider run plus its builds
+    "REASONING_MODEL": 900,  # 15 mins
+    "REASONING_MODEL_IDLE": 120,  # 2 mins without a streamed chunk
+    "OPENRANK": 5,  # per request, falls back to the last known score
+    "VERCEL_DEPLOYMENT": 600,  # 10 mins
+    "VERCEL_API": 30,  # per request attempt
+}
+
+# containers kept running so requests never wait for a cold start
+KEEP_WARM = {
+    "PROJECT_WEBHOOKS": 1,
+    "FARCASTER_WEBHOOK": 0,
+    "CONTEXT_ENHANCER": 0,
+}
+# webhooks are async and mostly wait on I/O, one container serves many requests
+WEBHOOK_CONCURRENT_INPUTS = 50
+
+CACHE_TTLS = {
+    "REASONING_MODEL": 604800,  # 7 days
+    "SEARCH_QUERIES": 86400,  # 1 day
+    "QUERY_EMBEDDING": 2592000,  # 30 days
+    "WEBHOOK_IDEMPOTENCY": 604800,  # 7 days
+    "OPENRANK": 21600,  # 6 hours until a score is refreshed
+    "OPENRANK_LAST_KNOWN": 2592000,  # 30 days as a fallback if OpenRank fails
+    "PENDING_DEPLOYMENT": 86400,  # 1 day to receive the Vercel webhook
+}
+
+LOCAL_CACHE_SIZES = {
+    "SEARCH_QUERIES": 1000,
+    "QUERY_EMBEDDING": 5000,
 }
 
 VOLUMES = {
     "GITHUB_REPOS": "frameception-github-repos",
     "SHARED_NODE_MODULES": "frameception-shared-node-modules",
     "PNPM_STORE": "frameception-pnpm-store",
+    "CONTEXT_INDEX": "frameception-context-index",
 }
 
 PATHS = {
     "GITHUB_REPOS": "/github-repos",
     "SHARED_NODE_MODULES": "/shared/node_modules",
     "PNPM_STORE": "/pnpm-store",
+    "CONTEXT_INDEX": "/context-index",
+}
+
+CAST_PROJECTS = {
+    "MIN_OPENRANK_PERCENTILE": 90,
+    "MAX_PER_FID": 3,  # projects one fid can create from casts per window
+    "RATE_LIMIT_WINDOW": 86400,  # 1 day
 }
 
 CODE_CONTEXT = {
     "ENABLED": True,
     "MIN_RAG_SCORE": 0.45,
+    "HYBRID_CANDIDATES": 10,  # per retriever, before rank fusion
+    "RRF_K": 60,
+    "MAX_TOKENS": 6000,  # budget for the context pasted into prompts
 }
 
 AIDER_CONFIG = {
@@ -42,4 +88,29 @@ AIDER_CONFIG = {
     "CODER": {"verbose": False, "cache_prompts": True},
 }
 
+LLM_ROUTES = {
+    "REASONING": [
+        ("together", "deepseek-ai/DeepSeek-R1"),
+        ("deepseek", "deepseek-reasoner"),
+        ("venice", "deepseek-r1-671b"),
+    ],
+    "PROJECT_NAME": [
+        ("deepseek", "deepseek-chat"),
+        ("together", "deepseek-ai/DeepSeek-V3"),
+        ("openai", "gpt-4o-mini"),
+    ],
+    "SEARCH_QUERIES": [
+        ("openai", "gpt-4o-mini"),
+        ("deepseek", "deepseek-chat"),
+    ],
+}
+
+LLM_ROUTER = {
+    "STATS_WINDOW": 50,
+    "MIN_SAMPLES_FOR_HEALTH": 5,
+    "MAX_ERROR_RATE": 0.5,
+    "MIN_HEDGE_DELAY_SECONDS": 2,
+    "MAX_CONCURRENT_REQUESTS": 16,
+}
+
 FRONTEND_URL = "https://farcasterframeception.vercel.app"
@@ -1,5 +1,6 @@
 from supabase import create_client
 import os
+import functools
 from typing import Optional
 import uuid
 from datetime import datetime
@@ -143,3 +144,9 @@ class Database:
         """Update project with given data"""
         print(f"updating project {project_id} with data: {data}")
         self.client.table("projects").update(data).eq("id", project_id).execute()
+
+
+@functools.lru_cache(maxsize=1)
+def get_database() -> Database:
+    """Get a Database whose client is reused across requests in this container."""
+    return Database()
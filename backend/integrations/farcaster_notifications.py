@@ -1,26 +1,14 @@
-import os
 import uuid
 import requests
-import redis
 from pydantic import BaseModel
 from typing import Optional, List
 
 from backend import config
+from backend.integrations.kv import get_kv_client
 
-KV_REST_API_URL = os.getenv("KV_REST_API_URL", "")
-KV_REST_API_TOKEN = os.getenv("KV_REST_API_TOKEN", "")
 FRONTEND_URL = config.FRONTEND_URL
 
 
-r = redis.Redis(
-    host=KV_REST_API_URL.replace("https://", ""),
-    password=KV_REST_API_TOKEN,
-    port=6379,
-    ssl=True,
-    decode_responses=True,
-)
-
-
 class FrameNotificationDetails(BaseModel):
     url: str
     token: str
@@ -48,7 +36,7 @@ def get_user_notification_details_key(fid: int) -> str:
 
 
 def get_user_notification_details(fid: int) -> Optional[FrameNotificationDetails]:
-    data = r.get(get_user_notification_details_key(fid))
+    data = get_kv_client().get(get_user_notification_details_key(fid))
     if not data:
         return None
     try:
@@ -60,11 +48,11 @@ def get_user_notification_details(fid: int) -> Optional[FrameNotificationDetails
 
 
 def set_user_notification_details(fid: int, details: FrameNotificationDetails) -> None:
-    r.set(get_user_notification_details_key(fid), details.json())
+    get_kv_client().set(get_user_notification_details_key(fid), details.json())
 
 
 def delete_user_notification_details(fid: int) -> None:
-    r.delete(get_user_notification_details_key(fid))
+    get_kv_client().delete(get_user_notification_details_key(fid))
 
 
 def send_notification(fid: int, title: str, body: str) -> dict:
@@ -0,0 +1,115 @@
+import os
+import json
+import hashlib
+import functools
+from typing import Any, Optional
+
+import redis
+
+
+@functools.lru_cache(maxsize=1)
+def get_kv_client() -> redis.Redis:
+    """Get the shared Redis client for the KV store (created once per container)."""
+    kv_rest_api_url = os.getenv("KV_REST_API_URL", "")
+    return redis.Redis(
+        host=kv_rest_api_url.replace("https://", ""),
+        password=os.getenv("KV_REST_API_TOKEN", ""),
+        port=6379,
+        ssl=True,
+        decode_responses=True,
+    )
+
+
+def get_content_hash(*parts: str) -> str:
+    """Stable hash over one or more strings, usable as part of a cache key."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def get_cached_json(key: str) -> Optional[Any]:
+    """Read a JSON value from the KV store. Cache errors are treated as misses."""
+    try:
+        data = get_kv_client().get(key)
+        return json.loads(data) if data else None
+    except Exception as e:
+        print(f"KV cache read failed for {key}: {str(e)}")
+        return None
+
+
+def set_cached_json(key: str, value: Any, ttl_seconds: int) -> None:
+    """Write a JSON value to the KV store with an expiry. Errors are only logged."""
+    try:
+        get_kv_client().set(key, json.dumps(value), ex=ttl_seconds)
+    except Exception as e:
+        print(f"KV cache write failed for {key}: {str(e)}")
+
+
+def pop_cached_json(key: str) -> Optional[Any]:
+    """Read and delete a JSON value in one step, so only one caller gets it."""
+    try:
+        data = get_kv_client().getdel(key)
+        return json.loads(data) if data else None
+    except Exception as e:
+        print(f"KV pop failed for {key}: {str(e)}")
+        return None
+
+
+def claim_key(key: str, value: Any, ttl_seconds: int) -> Optional[Any]:
+    """Atomically store a JSON value unless the key already exists.
+
+    Returns None if this call claimed the key, otherwise the existing value.
+    If the KV store is unavailable the key is treated as claimed.
+    """
+    try:
+        if get_kv_client().set(key, json.dumps(value), nx=True, ex=ttl_seconds):
+            return None
+        return get_cached_json(key)
+    except Exception as e:
+        print(f"KV claim failed for {key}: {str(e)}")
+        return None
+
+
+def delete_key(key: str) -> None:
+    """Delete a key from the KV store. Errors are only logged."""
+    try:
+        get_kv_client().delete(key)
+    except Exception as e:
+        print(f"KV delete failed for {key}: {str(e)}")
+
+
+def increment_counter(key: str, ttl_seconds: int) -> Optional[int]:
+    """Increment a counter that expires ttl_seconds after its first increment.
+
+    The expiry is set in the same transaction as the increment, so a counter
+    can't be left without a TTL. Returns the new count, or None if the KV
+    store is unavailable.
+    """
+    try:
+        pipeline = get_kv_client().pipeline(transaction=True)
+        pipeline.set(key, 0, ex=ttl_seconds, nx=True)
+        pipeline.incr(key)
+        _, count = pipeline.execute()
+        return count
+    except Exception as e:
+        print(f"KV increment failed for {key}: {str(e)}")
+        return None
+
+
+# DECR on an expired key would recreate it without a TTL
+DECREMENT_EXISTING_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('DECR', KEYS[1])
+end
+return 0
+"""
+
+
+def decrement_counter(key: str) -> None:
+    """Undo an increment_counter call. Errors are only logged."""
+    try:
+        get_kv_client().eval(DECREMENT_EXISTING_SCRIPT, 1, key)
+    except Exception as e:
+        print(f"KV decrement failed for {key}: {str(e)}")
@@ -1,64 +1,225 @@
-import os
-from typing import Tuple
+import time
+from typing import Callable, List, Optional, Tuple
 from openai import OpenAI
-from backend.utils.timing import measure_time
+from backend import config
+from backend.integrations.kv import get_cached_json, get_content_hash, set_cached_json
+from backend.integrations.llm_router import get_llm_router, get_provider_client
+from backend.utils.timing import format_elapsed_time, measure_time
 
 
 def get_deepseek_client() -> OpenAI:
     """Get a Deepseek client."""
-    return OpenAI(
-        api_key=os.environ["DEEPSEEK_API_KEY"], base_url="https://api.deepseek.com/v1"
-    )
+    return get_provider_client("deepseek")
 
 
 def get_openai_client() -> OpenAI:
     """Get an OpenAI client."""
-    return OpenAI(
-        api_key=os.environ["REAL_OPENAI_API_KEY"], base_url="https://api.openai.com/v1"
-    )
+    return get_provider_client("openai")
 
 
 def get_venice_ai_client() -> OpenAI:
     """Get a Venice AI client."""
-    return OpenAI(
-        api_key=os.environ["VENICE_AI_API_KEY"], base_url="https://api.venice.ai/api/v1"
-    )
+    return get_provider_client("venice")
 
 
 def get_together_ai_client() -> OpenAI:
     """Get a Together AI client."""
-    return OpenAI(
-        api_key=os.environ["TOGETHERAI_API_KEY"],
-        base_url="https://api.together.xyz/v1",
-    )
+    return get_provider_client("together")
+
+
+def get_reasoning_cache_key(prompt: str) -> str:
+    return f"frameception:llm:reasoning:{get_content_hash(prompt)}"
 
 
 @measure_time
-def send_prompt_to_reasoning_model(prompt: str) -> Tuple[str, str]:
-    client = get_together_ai_client()
-    response = client.chat.completions.create(
-        model="deepseek-ai/DeepSeek-R1",
+def send_prompt_to_reasoning_model(
+    prompt: str, on_answer_chunk: Optional[Callable[[str], None]] = None
+) -> Tuple[str, str]:
+    """Send a prompt to the reasoning model, reusing cached responses for the same prompt.
+
+    Args:
+        prompt: The prompt to send
+        on_answer_chunk: Optional callback receiving answer text as it streams in
+
+    Returns:
+        Tuple of (response, reasoning)
+    """
+    cache_key = get_reasoning_cache_key(prompt)
+    cached = get_cached_json(cache_key)
+    if cached:
+        print(f"send_prompt_to_reasoning_model: cache hit for {cache_key}")
+        return cached["response"], cached["reasoning"]
+
+    response, reasoning = stream_prompt_to_reasoning_model(
+        prompt, on_answer_chunk=on_answer_chunk
+    )
+    set_cached_json(
+        cache_key,
+        {"response": response, "reasoning": reasoning},
+        ttl_seconds=config.CACHE_TTLS["REASONING_MODEL"],
+    )
+    return response, reasoning
+
+
+def stream_prompt_to_reasoning_model(
+    prompt: str,
+    on_answer_chunk: Optional[Callable[[str], None]] = None,
+    keep_reasoning: bool = True,
+    timeout_seconds: int = config.TIMEOUTS["REASONING_MODEL"],
+) -> Tuple[str, str]:
+    """Stream a reasoning model completion, separating <think> blocks from the answer.
+
+    Args:
+        prompt: The prompt to send
+        on_answer_chunk: Optional callback receiving answer text as it streams in
+        keep_reasoning: Whether to collect the reasoning trace or discard it
+        timeout_seconds: Abort the stream if it runs longer than this
+
+    Returns:
+        Tuple of (response, reasoning). Reasoning is empty if not kept.
+
+    Raises:
+        TimeoutError: If the stream doesn't finish within timeout_seconds
+    """
+
+    def request(client: OpenAI, model: str) -> Tuple[str, str]:
+        return _stream_reasoning_completion(
+            client, model, prompt, on_answer_chunk, keep_reasoning, timeout_seconds
+        )
+
+    # streamed chunks are forwarded to the callback, so don't run duplicate requests
+    return get_llm_router().call("REASONING", request, hedge=False)
+
+
+def _stream_reasoning_completion(
+    client: OpenAI,
+    model: str,
+    prompt: str,
+    on_answer_chunk: Optional[Callable[[str], None]],
+    keep_reasoning: bool,
+    timeout_seconds: int,
+) -> Tuple[str, str]:
+    stream = client.chat.completions.create(
+        model=model,
         temperature=0.6,
         messages=[
             {"role": "user", "content": prompt},
         ],
+        stream=True,
+        timeout=config.TIMEOUTS["REASONING_MODEL_IDLE"],
     )
-    content = response.choices[0].message.content.strip()
-    if "<think>" not in content and "</think>" not in content:
-        return content, ""
 
-    reasoning = content.split("</think>")[0].split("<think>")[1].strip()
-    response = content.split("</think>")[1].strip()
-    return response, reasoning
+    splitter = ThinkBlockSplitter()
+    answer_parts = []
+    reasoning_parts = []
+    start_time = time.time()
+    first_answer_token_time = None
+
+    def handle_segments(segments: List[Tuple[bool, str]]):
+        nonlocal first_answer_token_time
+        for is_reasoning, text in segments:
+            if is_reasoning:
+                if keep_reasoning:
+                    reasoning_parts.append(text)
+                continue
+
+            if first_answer_token_time is None and text.strip():
+                first_answer_token_time = time.time() - start_time
+                print(
+                    "stream_prompt_to_reasoning_model: first answer token after "
+                    f"{format_elapsed_time(first_answer_token_time)}"
+                )
+            answer_parts.append(text)
+            if on_answer_chunk:
+                on_answer_chunk(text)
+
+    try:
+        for chunk in stream:
+            if time.time() - start_time > timeout_seconds:
+                raise TimeoutError(
+                    f"Reasoning model stream exceeded {timeout_seconds} seconds"
+                )
+            if not chunk.choices:
+                continue
+
+            delta = chunk.choices[0].delta
+            reasoning_content = getattr(delta, "reasoning_content", None)
+            if reasoning_content and keep_reasoning:
+                reasoning_parts.append(reasoning_content)
+            if delta.content:
+                handle_segments(splitter.feed(delta.content))
+
+        handle_segments(splitter.flush())
+    finally:
+        stream.close()
+
+    print(
+        f"stream_prompt_to_reasoning_model: {model} completed in "
+        f"{format_elapsed_time(time.time() - start_time)}"
+    )
+    return "".join(answer_parts).strip(), "".join(reasoning_parts).strip()
+
+
+class ThinkBlockSplitter:
+    """Incrementally split streamed model output into reasoning and answer text.
+
+    Reasoning is everything inside <think>...</think>. Tags may be split across
+    chunks, so a possible partial tag at the end of a chunk is held back until
+    the next chunk arrives.
+    """
+
+    OPEN_TAG = "<think>"
+    CLOSE_TAG = "</think>"
+
+    def __init__(self):
+        self.is_reasoning = False
+        self.buffer = ""
+
+    def feed(self, text: str) -> List[Tuple[bool, str]]:
+        """Add streamed text. Returns (is_reasoning, text) segments ready to emit."""
+        self.buffer += text
+        segments = []
+
+        while True:
+            tag = self.CLOSE_TAG if self.is_reasoning else self.OPEN_TAG
+            tag_index = self.buffer.find(tag)
+            if tag_index >= 0:
+                self._add_segment(segments, self.buffer[:tag_index])
+                self.buffer = self.buffer[tag_index + len(tag) :]
+                self.is_reasoning = not self.is_reasoning
+                continue
+
+            held_back = _get_partial_suffix_length(self.buffer, tag)
+            self._add_segment(segments, self.buffer[: len(self.buffer) - held_back])
+            self.buffer = self.buffer[len(self.buffer) - held_back :]
+            return segments
+
+    def flush(self) -> List[Tuple[bool, str]]:
+        """Emit any text still held back at the end of the stream."""
+        segments = []
+        self._add_segment(segments, self.buffer)
+        self.buffer = ""
+        return segments
+
+    def _add_segment(self, segments: List[Tuple[bool, str]], text: str):
+        if text:
+            segments.append((self.is_reasoning, text))
+
+
+def _get_partial_suffix_length(text: str, tag: str) -> int:
+    """Length of the longest suffix of text that is a proper prefix of tag."""
+    for length in range(min(len(text), len(tag) - 1), 0, -1):
+        if text.endswith(tag[:length]):
+            return length
+    return 0
 
 
 def generate_project_name(prompt: str) -> str:
     """Generate a project name from the user's prompt using LLM."""
-    deepseek = get_deepseek_client()
 
-    try:
-        response = deepseek.chat.completions.create(
-            model="deepseek-chat",
+    def request(client: OpenAI, model: str):
+        return client.chat.completions.create(
+            model=model,
             messages=[
                 {
                     "role": "system",
@@ -72,6 +233,9 @@ def generate_project_name(prompt: str) -> str:
             max_tokens=50,
             temperature=2,
         )
+
+    try:
+        response = get_llm_router().call("PROJECT_NAME", request)
         llm_content = response.choices[0].message.content.strip()
         print(f'generate_project_name: response "{llm_content}"')
         project_name = llm_content.split("\n")[0].replace('"', "").strip()
@@ -99,12 +263,11 @@ def generate_search_queries_from_user_input(
     """Generate expanded technical queries for documentation search."""
     print(f"Generating queries from prompt: {user_input}")
 
-    try:
-        client = get_openai_client()
-        system_prompt = QUERY_GEN_STR.format(num_queries=num_queries)
+    system_prompt = QUERY_GEN_STR.format(num_queries=num_queries)
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+    def request(client: OpenAI, model: str):
+        return client.chat.completions.create(
+            model=model,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {
@@ -114,6 +277,9 @@ def generate_search_queries_from_user_input(
             ],
         )
 
+    try:
+        response = get_llm_router().call("SEARCH_QUERIES", request)
+
         llm_content = response.choices[0].message.content.strip()
         print("Raw model response:", llm_content)
         llm_content = llm_content.replace("`", "").strip()
@@ -0,0 +1,211 @@
+import os
+import time
+import functools
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+from openai import OpenAI
+
+from backend import config
+
+T = TypeVar("T")
+
+LLM_PROVIDERS = {
+    "deepseek": {
+        "api_key_env": "DEEPSEEK_API_KEY",
+        "base_url": "https://api.deepseek.com/v1",
+    },
+    "openai": {
+        "api_key_env": "REAL_OPENAI_API_KEY",
+        "base_url": "https://api.openai.com/v1",
+    },
+    "venice": {
+        "api_key_env": "VENICE_AI_API_KEY",
+        "base_url": "https://api.venice.ai/api/v1",
+    },
+    "together": {
+        "api_key_env": "TOGETHERAI_API_KEY",
+        "base_url": "https://api.together.xyz/v1",
+    },
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_provider_client(provider: str) -> OpenAI:
+    """Get the pooled client for a provider (created once per container)."""
+    provider_config = LLM_PROVIDERS[provider]
+    return OpenAI(
+        api_key=os.environ[provider_config["api_key_env"]],
+        base_url=provider_config["base_url"],
+    )
+
+
+def is_provider_configured(provider: str) -> bool:
+    return bool(os.environ.get(LLM_PROVIDERS[provider]["api_key_env"]))
+
+
+class ProviderStats:
+    """Rolling latency and error rate for one provider + model."""
+
+    def __init__(self, window_size: int = config.LLM_ROUTER["STATS_WINDOW"]):
+        self.latencies = deque(maxlen=window_size)
+        self.outcomes = deque(maxlen=window_size)
+        self.lock = threading.Lock()
+
+    def record(self, latency_seconds: float, succeeded: bool):
+        with self.lock:
+            self.outcomes.append(succeeded)
+            if succeeded:
+                self.latencies.append(latency_seconds)
+
+    def get_latency_percentile(self, percentile: float) -> Optional[float]:
+        with self.lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(percentile * len(latencies)))
+        return latencies[index]
+
+    def get_error_rate(self) -> float:
+        with self.lock:
+            outcomes = list(self.outcomes)
+        if not outcomes:
+            return 0.0
+        return outcomes.count(False) / len(outcomes)
+
+    def is_healthy(self) -> bool:
+        with self.lock:
+            sample_count = len(self.outcomes)
+        if sample_count < config.LLM_ROUTER["MIN_SAMPLES_FOR_HEALTH"]:
+            return True
+        return self.get_error_rate() <= config.LLM_ROUTER["MAX_ERROR_RATE"]
+
+
+class LlmRouter:
+    """Routes LLM requests to the fastest healthy provider with failover.
+
+    Each route in config.LLM_ROUTES lists (provider, model) candidates. Healthy
+    candidates are tried in order of their rolling p50 latency; if a request is
+    still running after the candidate's p95 latency, a hedged request is sent to
+    the next candidate and whichever succeeds first wins.
+    """
+
+    def __init__(
+        self, routes: Dict[str, List[Tuple[str, str]]] = config.LLM_ROUTES
+    ):
+        self.routes = routes
+        self.stats: Dict[Tuple[str, str], ProviderStats] = {}
+        self.stats_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(
+            max_workers=config.LLM_ROUTER["MAX_CONCURRENT_REQUESTS"]
+        )
+
+    def call(
+        self,
+        route: str,
+        request: Callable[[OpenAI, str], T],
+        hedge: bool = True,
+    ) -> T:
+        """Run request(client, model) against the candidates of a route.
+
+        Args:
+            route: Name of the route in config.LLM_ROUTES
+            request: Function performing the request with a client and model name
+            hedge: Whether slow requests may be duplicated to the next candidate.
+                Disable for requests with side effects such as streaming callbacks.
+
+        Raises:
+            Exception: The last provider error if all candidates failed
+        """
+        candidates = self.get_ranked_candidates(route)
+        if not candidates:
+            raise Exception(f"No configured LLM provider for route {route}")
+
+        pending = {}
+        last_error = None
+        next_candidate_index = 0
+
+        def submit_next():
+            nonlocal next_candidate_index
+            candidate = candidates[next_candidate_index]
+            next_candidate_index += 1
+            future = self.executor.submit(self._timed_request, candidate, request)
+            pending[future] = candidate
+
+        submit_next()
+        while pending:
+            hedge_delay = None
+            if hedge and next_candidate_index < len(candidates):
+                hedge_delay = self._get_hedge_delay(
+                    candidates[next_candidate_index - 1]
+                )
+
+            done, _ = wait(pending, timeout=hedge_delay, return_when=FIRST_COMPLETED)
+            if not done:
+                print(
+                    f"llm_router: {candidates[next_candidate_index - 1]} slow for "
+                    f"route {route}, hedging to {candidates[next_candidate_index]}"
+                )
+                submit_next()
+                continue
+
+            for future in done:
+                provider, model = pending.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    print(f"llm_router: {provider}/{model} failed for {route}: {e}")
+                    last_error = e
+
+            if not pending and next_candidate_index < len(candidates):
+                submit_next()
+
+        raise last_error
+
+    def get_ranked_candidates(self, route: str) -> List[Tuple[str, str]]:
+        """Configured candidates, healthy ones first, each group fastest first."""
+        candidates = [
+            (provider, model)
+            for provider, model in self.routes[route]
+            if is_provider_configured(provider)
+        ]
+
+        def rank(candidate: Tuple[str, str]):
+            stats = self._get_stats(candidate)
+            p50 = stats.get_latency_percentile(0.5)
+            return (not stats.is_healthy(), p50 if p50 is not None else 0.0)
+
+        return sorted(candidates, key=rank)
+
+    def _timed_request(
+        self, candidate: Tuple[str, str], request: Callable[[OpenAI, str], T]
+    ) -> T:
+        provider, model = candidate
+        start_time = time.time()
+        try:
+            result = request(get_provider_client(provider), model)
+        except Exception:
+            self._get_stats(candidate).record(time.time() - start_time, False)
+            raise
+        self._get_stats(candidate).record(time.time() - start_time, True)
+        return result
+
+    def _get_hedge_delay(self, candidate: Tuple[str, str]) -> Optional[float]:
+        p95 = self._get_stats(candidate).get_latency_percentile(0.95)
+        if p95 is None:
+            return None
+        return max(p95, config.LLM_ROUTER["MIN_HEDGE_DELAY_SECONDS"])
+
+    def _get_stats(self, candidate: Tuple[str, str]) -> ProviderStats:
+        with self.stats_lock:
+            if candidate not in self.stats:
+                self.stats[candidate] = ProviderStats()
+            return self.stats[candidate]
+
+
+@functools.lru_cache(maxsize=1)
+def get_llm_router() -> LlmRouter:
+    """Get the shared router so latency stats accumulate across calls."""
+    return LlmRouter()
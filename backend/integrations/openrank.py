@@ -1,16 +1,119 @@
+import time
+import functools
+import threading
+from concurrent.futures import Future
+from typing import Dict, List
+
 import requests
 
+from backend import config
+from backend.integrations.kv import get_cached_json, set_cached_json
 
 OPENRANK_FID_SCORES_ENDPOINT = "https://graph.cast.k3l.io/scores/global/engagement/fids"
+OPENRANK_REQUEST_ATTEMPTS = 2
+# lookups arriving within this window are sent to OpenRank in one request
+OPENRANK_BATCH_WINDOW_SECONDS = 0.05
+
+
+def get_openrank_score_for_fid(fid: int) -> dict:
+    """Get the OpenRank score of a fid, e.g. {"fid": 3, "score": .., "percentile": ..}.
+
+    Scores change slowly, so a cached score is used while it's fresh. Otherwise
+    the score is fetched together with concurrent lookups, falling back to the
+    last known score if OpenRank fails.
+
+    Raises:
+        Exception: If OpenRank fails and there is no known score for the fid
+    """
+    cached = get_cached_json(get_openrank_cache_key(fid))
+    if cached and time.time() - cached["fetched_at"] < config.CACHE_TTLS["OPENRANK"]:
+        return cached["score"]
+
+    try:
+        return get_openrank_batcher().get_score(fid)
+    except Exception as e:
+        if not cached:
+            raise
+        print(f"OpenRank lookup for fid {fid} failed, using last known score: {e}")
+        return cached["score"]
+
+
+def fetch_openrank_scores(fids: List[int]) -> Dict[int, dict]:
+    """Fetch the scores of several fids in one request and cache them."""
+    for attempt in range(1, OPENRANK_REQUEST_ATTEMPTS + 1):
+        try:
+            response = requests.post(
+                OPENRANK_FID_SCORES_ENDPOINT,
+                json=fids,
+                timeout=config.TIMEOUTS["OPENRANK"],
+            )
+            if response.ok:
+                break
+            error = Exception(
+                f"Failed to fetch OpenRank scores for fids {fids}: {response.status_code}"
+            )
+        except requests.RequestException as e:
+            error = e
+        print(f"OpenRank request attempt {attempt} failed: {error}")
+    else:
+        raise error
+
+    scores = {score["fid"]: score for score in response.json()["result"]}
+    fetched_at = time.time()
+    for fid, score in scores.items():
+        set_cached_json(
+            get_openrank_cache_key(fid),
+            {"score": score, "fetched_at": fetched_at},
+            ttl_seconds=config.CACHE_TTLS["OPENRANK_LAST_KNOWN"],
+        )
+    return scores
+
+
+def get_openrank_cache_key(fid: int) -> str:
+    return f"frameception:openrank:{fid}"
+
+
+class OpenRankBatcher:
+    """Coalesces concurrent score lookups into a single OpenRank request.
+
+    The first lookup opens a short batch window; all fids requested until it
+    closes are fetched with one POST and each caller gets its own score.
+    """
+
+    def __init__(self, window_seconds: float = OPENRANK_BATCH_WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self.pending: Dict[int, Future] = {}
+        self.lock = threading.Lock()
+
+    def get_score(self, fid: int) -> dict:
+        with self.lock:
+            future = self.pending.get(fid)
+            if future is None:
+                future = Future()
+                self.pending[fid] = future
+                if len(self.pending) == 1:
+                    threading.Timer(self.window_seconds, self._flush).start()
+        return future.result()
+
+    def _flush(self):
+        with self.lock:
+            batch, self.pending = self.pending, {}
+
+        try:
+            scores = fetch_openrank_scores(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                future.set_exception(e)
+            return
+
+        for fid, future in batch.items():
+            if fid in scores:
+                future.set_result(scores[fid])
+            else:
+                future.set_exception(Exception(f"Failed to find score for fid {fid}"))
 
 
-def get_openrank_score_for_fid(fid: int):
-    response = requests.post(OPENRANK_FID_SCORES_ENDPOINT, json=[fid])
-    if not response.ok:
-        raise Exception(f"Failed to fetch OpenRank score for fid {fid}")
-    data = response.json()
-    result = data["result"]
-    user_score = next((r for r in result if r["fid"] == fid), None)
-    if not user_score:
-        raise Exception(f"Failed to find score for fid {fid} in data {result}")
-    return user_score
+@functools.lru_cache(maxsize=1)
+def get_openrank_batcher() -> OpenRankBatcher:
+    """Get the batcher shared by all lookups in this container."""
+    return OpenRankBatcher()
@@ -2,19 +2,100 @@ import base64
 import os
 import re
 import time
+import functools
+import threading
+from collections import defaultdict, deque
 import requests
-import git
-from git import Repo
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, List, Optional, Tuple
+from backend import config
 from backend.integrations.db import Database
+from backend.utils.farcaster import generate_domain_association
 
 VERCEL_CONFIG = {
     "FRAMEWORK": "nextjs",
     "INSTALL_CMD": "pnpm install",
     "BUILD_CMD": "pnpm build",
     "OUTPUT_DIR": ".next",
+    "DOMAIN_SUFFIX": "-frameception",
+    # exits 0 (= skip the build) until the first deployment, so pushes while the
+    # project is set up don't queue Vercel builds. VERCEL_GIT_PREVIOUS_SHA is
+    # only set once a deployment succeeded, from then on every push is built.
+    "IGNORE_BUILD_CMD": f'[ -z "$VERCEL_GIT_PREVIOUS_SHA" ] && [ "$VERCEL_GIT_COMMIT_MESSAGE" != "{config.DEPLOYMENT_COMPLETE_COMMIT_MESSAGE}" ]',
 }
 
+VERCEL_API_URL = "https://api.vercel.com"
+VERCEL_POOL_SIZE = 10
+VERCEL_LATENCY_WINDOW = 100
+
+
+class VercelRetry(Retry):
+    """Retries 5xx for idempotent requests and rate limits for all requests.
+
+    A 429 means Vercel didn't process the request, so POSTs (project creation,
+    deployments) are safe to retry then. Retries wait for Retry-After when
+    Vercel sends it, otherwise back off exponentially.
+    """
+
+    def is_retry(self, method, status_code, has_retry_after=False) -> bool:
+        if status_code == 429:
+            return bool(self.total)
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+VERCEL_RETRY = VercelRetry(
+    total=4,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+
+
+@functools.lru_cache(maxsize=1)
+def get_vercel_session() -> requests.Session:
+    """Get the pooled Vercel API session (created once per container)."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=VERCEL_POOL_SIZE,
+        pool_maxsize=VERCEL_POOL_SIZE,
+        max_retries=VERCEL_RETRY,
+    )
+    session.mount("https://", adapter)
+    session.headers.update(
+        {
+            "Authorization": f"Bearer {os.environ['VERCEL_TOKEN']}",
+            "Content-Type": "application/json",
+        }
+    )
+    return session
+
+
+class VercelLatencies:
+    """Rolling request latencies per Vercel endpoint."""
+
+    def __init__(self, window_size: int = VERCEL_LATENCY_WINDOW):
+        self.latencies: Dict[str, deque] = defaultdict(
+            lambda: deque(maxlen=window_size)
+        )
+        self.lock = threading.Lock()
+
+    def record(self, endpoint: str, latency_seconds: float):
+        with self.lock:
+            self.latencies[endpoint].append(latency_seconds)
+
+    def get_percentile(self, endpoint: str, percentile: float) -> Optional[float]:
+        with self.lock:
+            latencies = sorted(self.latencies[endpoint])
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(percentile * len(latencies)))
+        return latencies[index]
+
+
+vercel_latencies = VercelLatencies()
+
 
 class VercelApi:
     """Handles all Vercel-related operations with retries and error handling."""
@@ -23,31 +104,63 @@ class VercelApi:
         self.project_id = project_id
         self.job_id = job_id
         self.vercel_team_id = os.environ["VERCEL_TEAM_ID"]
-        self.vercel_token = os.environ["VERCEL_TOKEN"]
-        self.headers = {
-            "Authorization": f"Bearer {self.vercel_token}",
-            "Content-Type": "application/json",
-        }
+        self.session = get_vercel_session()
 
         self.db = Database()
 
+    def _request(
+        self,
+        method: str,
+        path: str,
+        endpoint: str,
+        params: Optional[dict] = None,
+        **kwargs,
+    ) -> requests.Response:
+        """Send a request to the Vercel API and record its latency.
+
+        @param endpoint: Name the latency is recorded under, e.g. "create_project"
+        """
+        start_time = time.perf_counter()
+        try:
+            return self.session.request(
+                method,
+                f"{VERCEL_API_URL}{path}",
+                params={"teamId": self.vercel_team_id, **(params or {})},
+                timeout=config.TIMEOUTS["VERCEL_API"],
+                **kwargs,
+            )
+        finally:
+            latency = time.perf_counter() - start_time
+            vercel_latencies.record(endpoint, latency)
+            p95 = vercel_latencies.get_percentile(endpoint, 0.95)
+            print(f"vercel {endpoint} took {latency:.2f}s (p95 {p95:.2f}s)")
+
     def create_project(self, project_name: str, repo_full_name: str):
         vercel_project = self._create_vercel_project(
             project_name, repo_full_name=repo_full_name
         )
+        # the domain is assigned upfront, so NEXT_PUBLIC_URL is set with the
+        # other env vars and the domain association is signed once here
+        domain = self._add_domain(vercel_project["id"], project_name)
+        # upsert, in case a previous attempt failed before setting them
+        self.set_env_vars(vercel_project["id"], get_project_env_vars(domain))
 
-        github_repo_id = vercel_project["link"]["repoId"]
-        vercel_project_id = vercel_project["id"]
+        project = self.db.get_project(self.project_id)
         update_project_data = dict(
-            github_repo_id=github_repo_id, vercel_project_id=vercel_project_id
+            github_repo_id=vercel_project["link"]["repoId"],
+            vercel_project_id=vercel_project["id"],
+            data={
+                **(project.get("data") or {}),
+                "domain": domain,
+                "domain_association": generate_domain_association(domain),
+            },
         )
+        # no deployment of the bare template, the first build is the final deploy
+        # and frontend_url is only set once it's live
         self.db.update_project(self.project_id, update_project_data)
 
-        self._deploy_vercel_project(project_name, github_repo_id)
-        self._store_frontend_url(project_name)
-
     def _create_vercel_project(self, project_name: str, repo_full_name: str) -> dict:
-        """Create a Vercel project with environment setup and deployment verification.
+        """Create a Vercel project.
         @param project_name: Name of the project
         @param repo_full_name: Full name of the GitHub repository = org/repo_name
         """
@@ -69,57 +182,11 @@ class VercelApi:
                 "installCommand": VERCEL_CONFIG["INSTALL_CMD"],
                 "buildCommand": VERCEL_CONFIG["BUILD_CMD"],
                 "outputDirectory": VERCEL_CONFIG["OUTPUT_DIR"],
-                "environmentVariables": [
-                    {
-                        "key": "NEXTAUTH_SECRET",
-                        "value": generate_random_secret(),
-                        "type": "encrypted",
-                        "target": ["production", "preview", "development"],
-                    },
-                    {
-                        "key": "KV_REST_API_URL",
-                        "value": os.environ["KV_REST_API_URL"],
-                        "type": "encrypted",
-                        "target": ["production", "preview", "development"],
-                    },
-                    {
-                        "key": "KV_REST_API_TOKEN",
-                        "value": os.environ["KV_REST_API_TOKEN"],
-                        "type": "encrypted",
-                        "target": ["production", "preview", "development"],
-                    },
-                    {
-                        "key": "NEYNAR_API_KEY",
-                        "value": os.environ["NEYNAR_API_KEY"],
-                        "type": "encrypted",
-                        "target": ["production", "preview", "development"],
-                    },
-                    {
-                        "key": "DUNE_API_KEY",
-                        "value": os.environ["DUNE_API_KEY"],
-                        "type": "encrypted",
-                        "target": ["production", "preview", "development"],
-                    },
-                    {
-                        "key": "NEXT_PUBLIC_POSTHOG_KEY",
-                        "value": os.environ["NEXT_PUBLIC_POSTHOG_KEY"],
-                        "type": "encrypted",
-                        "target": ["production"],
-                    },
-                    {
-                        "key": "NEXT_PUBLIC_POSTHOG_HOST",
-                        "value": os.environ["NEXT_PUBLIC_POSTHOG_HOST"],
-                        "type": "encrypted",
-                        "target": ["production"],
-                    },
-                ],
+                "commandForIgnoringBuildStep": VERCEL_CONFIG["IGNORE_BUILD_CMD"],
             }
 
-            response = requests.post(
-                f"https://api.vercel.com/v9/projects",
-                params={"teamId": self.vercel_team_id},
-                headers=self.headers,
-                json=project_data,
+            response = self._request(
+                "POST", "/v9/projects", "create_project", json=project_data
             )
 
             if not response.ok:
@@ -133,138 +200,89 @@ class VercelApi:
             self.db.add_log(self.job_id, "vercel", f"Error creating project: {str(e)}")
             raise
 
-    def _deploy_vercel_project(self, project_name: str, github_repo_id: str):
-        try:
-            self._trigger_deployment(project_name, github_repo_id)
-        except Exception as e:
-            self.db.add_log(self.job_id, "vercel", f"Error deploying project: {str(e)}")
-            raise
-
     def _get_project(self, name: str) -> Optional[dict]:
         """Get project details if it exists."""
         try:
-            response = requests.get(
-                f"https://api.vercel.com/v9/projects/{name}",
-                params={"teamId": self.vercel_team_id},
-                headers=self.headers,
-            )
+            response = self._request("GET", f"/v9/projects/{name}", "get_project")
             return response.json() if response.ok else None
         except Exception as e:
             print(f"Error fetching project: {str(e)}")
             return None
 
-    def _store_frontend_url(self, vercel_project_id: str):
-        try:
-            response = requests.get(
-                f"https://api.vercel.com/v9/projects/{vercel_project_id}/domains",
-                params={"teamId": self.vercel_team_id},
-                headers=self.headers,
-            )
+    def _add_domain(self, vercel_project_id: str, project_name: str) -> str:
+        """Assign a domain to the project before its first deployment, returns it.
 
-            if not response.ok:
-                raise Exception(f"Failed to fetch domains: {response.text}")
-
-            domains = response.json().get("domains", [])
-            if not domains:
-                raise Exception("No domains found for project")
-            print("domains", domains)
-            # Get the shortest domain name from the list
-            custom_domain = min((domain["name"] for domain in domains), key=len)
-
-            domain_env_var = {
-                "key": "NEXT_PUBLIC_URL",
-                "value": f"https://{custom_domain}",
-                "type": "plain",
-                "target": [
-                    "production",
-                ],
-            }
-            self._set_env_var(vercel_project_id, domain_env_var)
-            self.db.add_log(
-                self.job_id, "vercel", f"Set custom domain: {custom_domain}"
-            )
-            self.db.update_project(
-                self.project_id, {"frontend_url": f"https://{custom_domain}"}
-            )
+        If another Vercel project took the preferred domain, the domain gets a
+        suffix unique to this project.
+        """
+        try:
+            for domain in (
+                get_project_domain(project_name),
+                get_project_domain(project_name, unique_suffix=self.project_id[:8]),
+            ):
+                response = self._request(
+                    "POST",
+                    f"/v10/projects/{vercel_project_id}/domains",
+                    "add_domain",
+                    json={"name": domain},
+                )
+                # retried setups already added it
+                if response.ok or self._has_domain(vercel_project_id, domain):
+                    self.db.add_log(
+                        self.job_id, "vercel", f"Set custom domain: {domain}"
+                    )
+                    return domain
+                if response.status_code != 409:
+                    raise Exception(f"Failed to add domain: {response.text}")
+                print(f"domain {domain} is taken: {response.text}")
+            raise Exception(f"Failed to add domain, {domain} is taken too")
         except Exception as e:
             self.db.add_log(
                 self.job_id, "vercel", f"Error setting frontend URL: {str(e)}"
             )
             raise
 
-    # def _setup_custom_domain(self, project_name: str, vercel_project_id: str) -> None:
-    #     custom_domain = (
-    #         f"{project_name.lower().replace(' ', '-')}-frameception.vercel.app"
-    #     )
-    #     print(f"Setting custom domain: {custom_domain}")
-    #     response = requests.post(
-    #         f"https://api.vercel.com/v10/projects/{vercel_project_id}/domains",
-    #         params={"teamId": self.vercel_team_id},
-    #         headers=self.headers,
-    #         json={
-    #             "name": custom_domain,
-    #             "gitBranch": "main",
-    #         },
-    #     )
-    #     if not response.ok:
-    #         raise Exception(f"Failed to set custom domain: {response.text}")
-    #     return custom_domain
-
-    def _set_env_var(self, project_name: str, env_var: dict) -> None:
-        """Set a single environment variable with error handling."""
-        try:
-            response = requests.post(
-                f"https://api.vercel.com/v9/projects/{project_name}/env",
-                params={"teamId": self.vercel_team_id},
-                headers=self.headers,
-                json=env_var,
-            )
+    def _has_domain(self, vercel_project_id: str, domain: str) -> bool:
+        response = self._request(
+            "GET", f"/v9/projects/{vercel_project_id}/domains/{domain}", "get_domain"
+        )
+        return response.ok
 
-            if not response.ok:
-                print(
-                    f"Failed to set {env_var['key']}: {response.text}",
-                )
-            else:
-                print(f"Set environment variable: {env_var['key']}")
-        except Exception as e:
-            self.db.add_log(
-                self.job_id, "vercel", f"Error setting {env_var['key']}: {str(e)}"
-            )
+    def set_env_vars(self, vercel_project_id: str, env_vars: List[dict]) -> None:
+        """Create or update environment variables in one request and verify them.
+        @param vercel_project_id: Id or name of the Vercel project
+        @param env_vars: Variables with key, value, type and target
 
-    def _trigger_deployment(
-        self, project_name: str, github_repo_id: str
-    ) -> Optional[dict]:
+        Raises if any variable wasn't set, since a missing variable only shows
+        up later as a failed deployment.
+        """
+        keys = [env_var["key"] for env_var in env_vars]
         try:
-            response = requests.post(
-                "https://api.vercel.com/v13/deployments",
-                params={"teamId": self.vercel_team_id},
-                headers=self.headers,
-                json={
-                    "name": project_name,
-                    "target": "production",
-                    "gitSource": {
-                        "type": "github",
-                        "ref": "main",
-                        "repoId": github_repo_id,
-                    },
-                },
+            response = self._request(
+                "POST",
+                f"/v10/projects/{vercel_project_id}/env",
+                "set_env_vars",
+                params={"upsert": "true"},
+                json=env_vars,
             )
+            if not response.ok:
+                raise Exception(f"Failed to set env vars {keys}: {response.text}")
+            result = response.json()
+            if result.get("failed"):
+                raise Exception(f"Failed to set env vars: {result['failed']}")
 
-            if response.ok:
-                deployment = response.json()
-                print(f"triggering a deployment worked: {deployment}")
-                self.db.add_log(
-                    self.job_id, "vercel", f"Triggered deployment: {deployment['id']}"
-                )
-                return deployment
-            else:
-                print(f"trigger deployment failed: {response.text}")
-                raise Exception(f"Failed to trigger deployment: {response.text}")
+            # a single created variable is returned as an object, several as a list
+            created = result.get("created", [])
+            created = created if isinstance(created, list) else [created]
+            missing = set(keys) - {env["key"] for env in created}
+            if missing:
+                raise Exception(f"Env vars missing after setting them: {missing}")
+            print(f"Set environment variables: {keys}")
         except Exception as e:
             self.db.add_log(
-                self.job_id, "vercel", f"Error triggering deployment: {str(e)}"
+                self.job_id, "vercel", f"Error setting env vars {keys}: {str(e)}"
             )
-            return None
+            raise
 
     # def _wait_for_deployment(self, deployment_id: str, timeout: int = 300) -> bool:
     #     """Wait for deployment to complete."""
@@ -305,6 +323,73 @@ class VercelApi:
     #     return False
 
 
+def get_project_domain(project_name: str, unique_suffix: str = "") -> str:
+    """The vercel.app domain a project is served on, without https://"""
+    suffix = VERCEL_CONFIG["DOMAIN_SUFFIX"]
+    if unique_suffix:
+        suffix = f"-{unique_suffix}{suffix}"
+    # repo names keep "." and "_" (e.g. dwr.eth), which aren't valid in a DNS label
+    label = re.sub(r"[^a-z0-9-]", "-", project_name.lower())
+    label = re.sub(r"-{2,}", "-", label).strip("-")
+    # a DNS label has at most 63 characters
+    label = label[: 63 - len(suffix)].strip("-") or "frame"
+    return f"{label}{suffix}.vercel.app"
+
+
+def get_project_env_vars(domain: str) -> List[dict]:
+    """Environment variables every generated project needs."""
+    return [
+        {
+            "key": "NEXT_PUBLIC_URL",
+            "value": f"https://{domain}",
+            "type": "plain",
+            "target": ["production"],
+        },
+        {
+            "key": "NEXTAUTH_SECRET",
+            "value": generate_random_secret(),
+            "type": "encrypted",
+            "target": ["production", "preview", "development"],
+        },
+        {
+            "key": "KV_REST_API_URL",
+            "value": os.environ["KV_REST_API_URL"],
+            "type": "encrypted",
+            "target": ["production", "preview", "development"],
+        },
+        {
+            "key": "KV_REST_API_TOKEN",
+            "value": os.environ["KV_REST_API_TOKEN"],
+            "type": "encrypted",
+            "target": ["production", "preview", "development"],
+        },
+        {
+            "key": "NEYNAR_API_KEY",
+            "value": os.environ["NEYNAR_API_KEY"],
+            "type": "encrypted",
+            "target": ["production", "preview", "development"],
+        },
+        {
+            "key": "DUNE_API_KEY",
+            "value": os.environ["DUNE_API_KEY"],
+            "type": "encrypted",
+            "target": ["production", "preview", "development"],
+        },
+        {
+            "key": "NEXT_PUBLIC_POSTHOG_KEY",
+            "value": os.environ["NEXT_PUBLIC_POSTHOG_KEY"],
+            "type": "encrypted",
+            "target": ["production"],
+        },
+        {
+            "key": "NEXT_PUBLIC_POSTHOG_HOST",
+            "value": os.environ["NEXT_PUBLIC_POSTHOG_HOST"],
+            "type": "encrypted",
+            "target": ["production"],
+        },
+    ]
+
+
 def generate_random_secret() -> str:
     """Generate a cryptographically secure random secret"""
     return base64.b64encode(os.urandom(32)).decode("utf-8")
@@ -1,90 +1,367 @@
 import time
-
-from backend.integrations.openrank import get_openrank_score_for_fid
-from backend.types import UserContext
+import asyncio
+from typing import Optional, Tuple
+
+from backend.types import (
+    CreateProjectRequest,
+    DeployProjectRequest,
+    FarcasterWebhookEvent,
+    UpdateCodeRequest,
+    UserContext,
+)
 from backend.utils.sentry import setup_sentry
 import modal
-
-from backend.modal import app, volumes, all_secrets, db_secrets
+from fastapi import HTTPException, Request
+
+from backend.modal import (
+    app,
+    volumes,
+    all_secrets,
+    db_secrets,
+    farcaster_secrets,
+    kv_secrets,
+    vercel_secrets,
+    context_image,
+    context_index_volume,
+    context_index_volumes,
+    farcaster_webhook_image,
+    webhook_image,
+)
 from backend import config
-from backend.integrations.db import Database
+from backend.integrations.db import get_database
+from backend.integrations.kv import (
+    claim_key,
+    delete_key,
+    get_content_hash,
+    get_kv_client,
+    set_cached_json,
+)
+from backend.services.cast_filter import (
+    get_cast_rejection,
+    is_project_request,
+    release_cast_project_quota,
+    reply_to_rejected_cast,
+)
+from backend.services.deployment_watch import (
+    finish_deployment,
+    pop_pending_deployment,
+    verify_vercel_signature,
+    watch_deployment,
+)
 
 
-@app.function(secrets=[modal.Secret.from_name("llm-api-keys")])
-@modal.web_endpoint(method="POST", label="context-enhancer")
-def enhance_context_endpoint(data: dict) -> dict:
-    """Enhance a user prompt with relevant technical context"""
-    try:
-        if "prompt" not in data or not data["prompt"].strip():
-            return {"error": "Prompt is required"}, 400
+@app.cls(
+    image=context_image,
+    secrets=[modal.Secret.from_name("llm-api-keys"), *kv_secrets],
+    volumes=context_index_volumes,
+    keep_warm=config.KEEP_WARM["CONTEXT_ENHANCER"],
+)
+class ContextEnhancer:
+    @modal.enter()
+    def load_index(self):
+        """Load the context index once when the container starts"""
+        from backend.services.context_enhancer import preload_context_index
 
-        from backend.services.context_enhancer import CodeContextEnhancer
+        preload_context_index()
 
-        enhancer = CodeContextEnhancer()
-        context = enhancer.get_relevant_context(data["prompt"])
+    @modal.web_endpoint(method="POST", label="context-enhancer")
+    def enhance_context_endpoint(self, data: dict) -> dict:
+        """Enhance a user prompt with relevant technical context"""
+        try:
+            if "prompt" not in data or not data["prompt"].strip():
+                return {"error": "Prompt is required"}, 400
 
+            from backend.services.context_enhancer import CodeContextEnhancer
+
+            enhancer = CodeContextEnhancer()
+            context = enhancer.get_relevant_context(data["prompt"], data.get("apis"))
+
+            return {
+                "prompt": data["prompt"],
+                "context": context,
+            }
+
+        except Exception as e:
+            return {"error": f"Context enhancement failed: {str(e)}"}, 500
+
+
+@app.cls(
+    image=webhook_image,
+    secrets=db_secrets + kv_secrets,
+    keep_warm=config.KEEP_WARM["PROJECT_WEBHOOKS"],
+    allow_concurrent_inputs=config.WEBHOOK_CONCURRENT_INPUTS,
+)
+class ProjectWebhooks:
+    """Webhooks of the frontend, sharing warm containers and clients."""
+
+    @modal.enter()
+    def connect(self):
+        """Create the Supabase and KV clients once when the container starts"""
+        get_database()
+        get_kv_client()
+
+    @modal.web_endpoint(label="create-project-webhook", method="POST", docs=True)
+    async def create_project_webhook(self, request: CreateProjectRequest) -> dict:
+        """
+        Webhook that creates a project record and triggers background job.
+
+        Requests repeating an idempotency_key get the first request's project.
+        """
+        data = request.model_dump()
+        print(f"received create project webhook from fid {request.user_context.fid}")
+
+        idempotency_key = None
+        if request.idempotency_key:
+            idempotency_key = get_idempotency_key(
+                "create_project",
+                f"{request.user_context.fid}:{request.idempotency_key}",
+            )
+            existing = await asyncio.to_thread(
+                claim_key,
+                idempotency_key,
+                {"status": "pending"},
+                config.CACHE_TTLS["WEBHOOK_IDEMPOTENCY"],
+            )
+            if existing:
+                print(f"duplicate create project request: {existing}")
+                return {
+                    **existing,
+                    "status": "pending",
+                    "message": "Project setup already started",
+                }
+
+        try:
+            project_id, job_id = await asyncio.to_thread(
+                create_project_with_setup_job, request.user_context.fid, data
+            )
+        except Exception:
+            if idempotency_key:
+                await asyncio.to_thread(delete_key, idempotency_key)
+            raise
+
+        setup_project_data = {
+            "project_id": project_id,
+            "job_id": job_id,
+            "data": data,
+        }
+        try:
+            await setup_project.spawn.aio(setup_project_data)
+        except Exception as e:
+            # a retry with the same key must start a new setup
+            if idempotency_key:
+                await asyncio.to_thread(delete_key, idempotency_key)
+            await asyncio.to_thread(
+                get_database().update_job_status,
+                job_id,
+                "failed",
+                f"Failed to start project setup: {str(e)}",
+            )
+            raise
+
+        if idempotency_key:
+            await asyncio.to_thread(
+                set_cached_json,
+                idempotency_key,
+                {"project_id": project_id, "job_id": job_id},
+                config.CACHE_TTLS["WEBHOOK_IDEMPOTENCY"],
+            )
         return {
-            "prompt": data["prompt"],
-            "context": context,
+            "status": "pending",
+            "project_id": project_id,
+            "job_id": job_id,
+            "message": "Project setup started",
         }
 
-    except Exception as e:
-        return {"error": f"Context enhancement failed: {str(e)}"}, 500
+    @modal.web_endpoint(label="update-code-webhook", method="POST", docs=True)
+    async def update_code_webhook(self, request: UpdateCodeRequest) -> dict:
+        """
+        Webhook that updates the code for a project.
+        """
+        data = request.model_dump()
+        print(f"received update code webhook for project {request.project_id}")
+
+        job_id = await asyncio.to_thread(
+            get_database().create_job,
+            project_id=request.project_id,
+            job_type="update_code",
+            data=data,
+        )
+        data["job_id"] = job_id
 
+        await update_code.spawn.aio(data)
 
-@app.function(secrets=db_secrets)
-@modal.web_endpoint(label="create-project-webhook", method="POST", docs=True)
-def create_project_webhook(data: dict) -> dict:
-    """
-    Webhook that creates a project record and triggers background job.
-    """
-    print(f"received webhook data: {data}")
-    required_fields = ["prompt", "user_context"]
-    for field in required_fields:
-        if field not in data:
-            return {"error": f"Missing required field: {field}"}, 400
+        return {
+            "status": "pending",
+            "project_id": data["project_id"],
+            "job_id": job_id,
+            "message": "Code update started",
+        }
 
-    db = Database()
-    project_id = db.create_project(
-        fid_owner=data["user_context"]["fid"],
-        repo_url="",
-        frontend_url="",
-    )
+    @modal.web_endpoint(label="deploy-project-webhook", method="POST", docs=True)
+    async def deploy_project_webhook(self, request: DeployProjectRequest) -> dict:
+        """
+        Webhook that triggers final deployment steps for a project.
+        """
+        data = request.model_dump()
+        print(f"received deploy project webhook for project {request.project_id}")
+
+        job_id = await asyncio.to_thread(
+            get_database().create_job,
+            project_id=request.project_id,
+            job_type="final_deploy",
+            data=data,
+        )
 
-    job_id = db.create_job(project_id=project_id, job_type="setup_project", data=data)
+        await deploy_project.spawn.aio(
+            {
+                "project_id": request.project_id,
+                "job_id": job_id,
+                "user_context": data["user_context"],
+            }
+        )
 
-    setup_project_data = {
-        "project_id": project_id,
-        "job_id": job_id,
-        "data": data,
-    }
-    setup_project.spawn(setup_project_data)
-    return {
-        "status": "pending",
-        "project_id": project_id,
-        "job_id": job_id,
-        "message": "Project setup started",
+        return {
+            "status": "pending",
+            "project_id": data["project_id"],
+            "job_id": job_id,
+            "message": "Project deployment started",
+        }
+
+
+@app.cls(
+    image=farcaster_webhook_image,
+    secrets=kv_secrets + farcaster_secrets,
+    keep_warm=config.KEEP_WARM["FARCASTER_WEBHOOK"],
+    allow_concurrent_inputs=config.WEBHOOK_CONCURRENT_INPUTS,
+)
+class FarcasterWebhook:
+    @modal.enter()
+    def connect(self):
+        """Create the KV client and load the Neynar client once per container"""
+        import backend.integrations.neynar  # noqa: F401
+
+        get_kv_client()
+
+    @modal.web_endpoint(label="farcaster-webhook", docs=True, method="POST")
+    async def handle_farcaster_webhook(self, event: FarcasterWebhookEvent) -> dict:
+        # import os
+        # if token.credentials != os.environ["NEYNAR_WEBHOOK_AUTH_TOKEN"]:
+        #     raise HTTPException(
+        #         status_code=status.HTTP_401_UNAUTHORIZED,
+        #         detail="Incorrect bearer token",
+        #         headers={"WWW-Authenticate": "Bearer"},
+        #     )
+        print(
+            f"received handle_farcaster_webhook {event.type} for {event.data.get('hash')}"
+        )
+        if event.type != "cast.created" or not is_project_request(event.data):
+            return {"status": "ignored"}
+
+        # Neynar retries deliveries, each cast may only create one project
+        idempotency_key = get_cast_idempotency_key(event.data["hash"])
+        existing = await asyncio.to_thread(
+            claim_key,
+            idempotency_key,
+            {"status": "pending"},
+            config.CACHE_TTLS["WEBHOOK_IDEMPOTENCY"],
+        )
+        if existing:
+            print(f"duplicate cast {event.data['hash']}: {existing}")
+            return {**existing, "status": "duplicate"}
+
+        # reject here so only accepted casts start the heavy project pipeline
+        try:
+            rejection = await asyncio.to_thread(get_cast_rejection, event.data)
+        except Exception:
+            await asyncio.to_thread(delete_key, idempotency_key)
+            raise
+        if rejection:
+            try:
+                await asyncio.to_thread(reply_to_rejected_cast, event.data, rejection)
+            except Exception:
+                # let a retried delivery of this cast send the reply
+                await asyncio.to_thread(delete_key, idempotency_key)
+                raise
+            await asyncio.to_thread(
+                set_cached_json,
+                idempotency_key,
+                {"status": "rejected"},
+                config.CACHE_TTLS["WEBHOOK_IDEMPOTENCY"],
+            )
+            return {"status": "ignored", "message": rejection}
+
+        # release the cast so a Neynar redelivery can retry it
+        try:
+            await create_project_from_cast.spawn.aio(event.model_dump())
+        except Exception:
+            await asyncio.to_thread(delete_key, idempotency_key)
+            await asyncio.to_thread(release_cast_project_quota, event.data)
+            raise
+        return {"status": "success"}
+
+
+@app.function(image=webhook_image, secrets=kv_secrets + vercel_secrets)
+@modal.web_endpoint(label="vercel-webhook", method="POST")
+async def vercel_webhook(request: Request) -> dict:
+    """Finish deployments when Vercel reports their build result."""
+    body = await request.body()
+    if not verify_vercel_signature(body, request.headers.get("x-vercel-signature", "")):
+        raise HTTPException(status_code=403, detail="Invalid signature")
+
+    event = await request.json()
+    errors = {
+        "deployment.error": "Vercel deployment failed",
+        "deployment.canceled": "Vercel deployment was canceled",
     }
+    if event.get("type") != "deployment.succeeded" and event.get("type") not in errors:
+        return {"status": "ignored"}
+
+    payload = event.get("payload", {})
+    commit_sha = payload.get("deployment", {}).get("meta", {}).get("githubCommitSha")
+    vercel_project_id = payload.get("project", {}).get("id")
+    if not commit_sha or not vercel_project_id:
+        return {"status": "ignored"}
+
+    # only deployments we're waiting for, and each of them only once
+    pending_deployment = await asyncio.to_thread(
+        pop_pending_deployment, vercel_project_id, commit_sha
+    )
+    if not pending_deployment:
+        return {"status": "ignored"}
+
+    print(f"vercel {event['type']} for project {pending_deployment['project_id']}")
+    await finish_vercel_deployment.spawn.aio(
+        pending_deployment, errors.get(event["type"])
+    )
+    return {"status": "success"}
+
+
+def get_idempotency_key(kind: str, key: str) -> str:
+    return f"frameception:idempotency:{kind}:{get_content_hash(key)}"
+
 
+def get_cast_idempotency_key(cast_hash: str) -> str:
+    return get_idempotency_key("cast", cast_hash)
 
-@app.function()
-@modal.web_endpoint(label="farcaster-webhook", docs=True, method="POST")
-def handle_farcaster_webhook(data: dict) -> dict:
-    # import os
-    # if token.credentials != os.environ["NEYNAR_WEBHOOK_AUTH_TOKEN"]:
-    #     raise HTTPException(
-    #         status_code=status.HTTP_401_UNAUTHORIZED,
-    #         detail="Incorrect bearer token",
-    #         headers={"WWW-Authenticate": "Bearer"},
-    #     )
-    print(f"received handle_farcaster_webhook with data: {data}")
-    event_type = data.get("type")
-    if event_type == "cast.created":
-        text = data.get("data", {}).get("text", "").lower()
-        if text and "build" in text and "frame" in text:
-            create_project_from_cast.spawn(data)
-            return {"status": "success"}
-    return {"status": "ignored"}
+
+def create_project_with_setup_job(
+    fid_owner: int, payload: dict, project_data: Optional[dict] = None
+) -> Tuple[str, str]:
+    """Create a project and its setup job, returns (project_id, job_id).
+
+    The job references the project, so the inserts can't run concurrently.
+    """
+    db = get_database()
+    project_id = db.create_project(
+        fid_owner=fid_owner,
+        repo_url="",
+        frontend_url="",
+        data=project_data or {},
+    )
+    job_id = db.create_job(
+        project_id=project_id, job_type="setup_project", data=payload
+    )
+    return project_id, job_id
 
 
 def get_prompt_from_conversation(conversation: str) -> str:
@@ -95,7 +372,7 @@ def get_prompt_from_conversation(conversation: str) -> str:
 
 @app.function(secrets=all_secrets)
 def create_project_from_cast(data: dict):
-    """Handle cast.created webhooks from Neynar"""
+    """Handle cast.created webhooks from Neynar that passed the cast filter"""
     print("start create_project_from_cast with data: ", data)
 
     # Post frame reply to original cast
@@ -108,44 +385,31 @@ def create_project_from_cast(data: dict):
         print("conversation: ", conversation)
     except Exception as e:
         print("Failed to fetch conversation", e)
+        # let a retried delivery of this cast try again
+        delete_key(get_cast_idempotency_key(cast["hash"]))
+        release_cast_project_quota(cast)
         return {"error": "Failed to fetch conversation", "message": f"{str(e)}"}, 500
 
     user_fid = cast["author"]["fid"]
-    openrank_score = get_openrank_score_for_fid(user_fid)
-    print("openrank_score: ", openrank_score)
-    if openrank_score["percentile"] < 90:
-        print(
-            f"user with fid {user_fid} has openrank percentile below 90, not creating project. {openrank_score}",
-        )
-        NeynarPost().reply_to_cast(
-            text=f"you must be in the top 10% of users (based on openrank score) to create a project, while we're testing in alpha. {config.FRONTEND_URL}",
-            parent_hash=cast["hash"],
-            parent_fid=user_fid,
-            embeds=[{"url": config.FRONTEND_URL}],
-        )
-
-        return {
-            "status": "ignored",
-            "message": "User does not meet minimum requirements to create a project",
-        }
-
     prompt = get_prompt_from_conversation(conversation)
     user_context = cast["author"]
     payload = dict(
         prompt=prompt,
         user_context=user_context,
     )
-    db = Database()
-    project_id = db.create_project(
-        fid_owner=user_fid,
-        repo_url="",
-        frontend_url="",
-        data={"cast": cast, **payload},
-    )
-    job_id = db.create_job(
-        project_id=project_id,
-        job_type="setup_project",
-        data=payload,
+    db = get_database()
+    try:
+        project_id, job_id = create_project_with_setup_job(
+            user_fid, payload, project_data={"cast": cast, **payload}
+        )
+    except Exception:
+        delete_key(get_cast_idempotency_key(cast["hash"]))
+        release_cast_project_quota(cast)
+        raise
+    set_cached_json(
+        get_cast_idempotency_key(cast["hash"]),
+        {"project_id": project_id, "job_id": job_id},
+        config.CACHE_TTLS["WEBHOOK_IDEMPOTENCY"],
     )
 
     setup_project.spawn(
@@ -217,67 +481,6 @@ def setup_project(data: dict) -> dict:
     return {"status": "core_setup_complete"}
 
 
-@app.function(secrets=db_secrets)
-@modal.web_endpoint(label="update-code-webhook", method="POST", docs=True)
-def update_code_webhook(data: dict) -> dict:
-    """
-    Webhook that updates the code for a project.
-    """
-    print(f"received webhook data: {data}")
-    required_fields = ["prompt", "project_id", "user_context"]
-    for field in required_fields:
-        if field not in data:
-            return {"error": f"Missing required field: {field}"}, 400
-
-    db = Database()
-    job_id = db.create_job(
-        project_id=data["project_id"], job_type="update_code", data=data
-    )
-    data["job_id"] = job_id
-
-    update_code.spawn(data)
-
-    return {
-        "status": "pending",
-        "project_id": data["project_id"],
-        "job_id": job_id,
-        "message": "Code update started",
-    }
-
-
-@app.function(secrets=db_secrets)
-@modal.web_endpoint(label="deploy-project-webhook", method="POST", docs=True)
-def deploy_project_webhook(data: dict) -> dict:
-    """
-    Webhook that triggers final deployment steps for a project.
-    """
-    print(f"received webhook data: {data}")
-    required_fields = ["project_id", "user_context"]
-    for field in required_fields:
-        if field not in data:
-            return {"error": f"Missing required field: {field}"}, 400
-
-    db = Database()
-    job_id = db.create_job(
-        project_id=data["project_id"], job_type="final_deploy", data=data
-    )
-
-    deploy_project.spawn(
-        {
-            "project_id": data["project_id"],
-            "job_id": job_id,
-            "user_context": data["user_context"],
-        }
-    )
-
-    return {
-        "status": "pending",
-        "project_id": data["project_id"],
-        "job_id": job_id,
-        "message": "Project deployment started",
-    }
-
-
 @app.function(
     volumes=volumes,
     timeout=config.TIMEOUTS["PROJECT_SETUP"],
@@ -295,7 +498,40 @@ def deploy_project(data: dict) -> dict:
     user_context = data["user_context"]
 
     DeployProjectService(project_id, job_id, user_context).run()
-    return {"status": "deployment_complete"}
+    return {"status": "deployment_pushed"}
+
+
+@app.function(
+    image=farcaster_webhook_image,
+    timeout=config.TIMEOUTS["VERCEL_DEPLOYMENT"] + 60,
+    secrets=db_secrets + kv_secrets + farcaster_secrets + vercel_secrets,
+    name=config.MODAL_WATCH_DEPLOYMENT_FUNCTION_NAME,
+)
+def watch_vercel_deployment(pending_deployment: dict) -> None:
+    """Poll the Vercel build of a deployment, fallback for missed Vercel webhooks"""
+    watch_deployment(pending_deployment)
+
+
+@app.function(
+    image=context_image,
+    secrets=[modal.Secret.from_name("llm-api-keys")],
+    volumes=context_index_volumes,
+    name=config.MODAL_UPDATE_CONTEXT_INDEX_FUNCTION_NAME,
+)
+def update_context_index() -> None:
+    """Embed new or changed docs into the context index on its volume"""
+    from backend.services.context_enhancer import update_docs_index
+
+    update_docs_index()
+    context_index_volume.commit()
+
+
+@app.function(
+    image=farcaster_webhook_image,
+    secrets=db_secrets + kv_secrets + farcaster_secrets,
+)
+def finish_vercel_deployment(pending_deployment: dict, error: str = None) -> None:
+    finish_deployment(pending_deployment, error)
 
 
 @app.function(
@@ -6,6 +6,8 @@ CONTAINER_ENV_VARS = {
     "PNPM_STORE_PATH": "/pnpm-store",
     "PNPM_HOME": "/root/.local/share/pnpm",
     "SHELL": "/bin/bash",
+    # the context index lives on a volume, see context_index_volume
+    "CONTEXT_INDEX_PATH": config.PATHS["CONTEXT_INDEX"],
 }
 
 base_image = (
@@ -32,6 +34,7 @@ base_image = (
         "farcaster-py",
         "blake3",
         "llama-index",
+        "numpy",
     )
     .run_commands(
         "pip install -U aider-chat",
@@ -44,9 +47,58 @@ base_image = (
     )
 )
 
+# Webhooks only validate requests, write to Supabase/Redis and spawn jobs, so
+# they get a small image that cold-starts fast. Everything backend/main.py
+# imports at module level must be installed here.
+webhook_image = modal.Image.debian_slim(python_version="3.12").pip_install(
+    "fastapi",
+    "supabase",
+    "redis",
+    "requests",
+)
+
+# the farcaster webhook also replies to rejected casts
+farcaster_webhook_image = webhook_image.pip_install(
+    "farcaster-py",
+    "blake3",
+    "eth-account",
+)
+
+context_image = webhook_image.pip_install(
+    "openai",
+    "llama-index",
+    "numpy",
+).env({"CONTEXT_INDEX_PATH": config.PATHS["CONTEXT_INDEX"]})
+
+# Sandboxes only install and build the generated Next.js projects, so they
+# need node and pnpm but none of the Python dependencies of base_image.
+sandbox_image = (
+    modal.Image.debian_slim(python_version="3.12")
+    .env(CONTAINER_ENV_VARS)
+    .apt_install(
+        "git",
+        "curl",
+        "build-essential",
+    )
+    .run_commands(
+        "curl -fsSL https://deb.nodesource.com/setup_20.x | bash -",
+        "apt-get install -y nodejs",
+        "curl -fsSL https://get.pnpm.io/install.sh | SHELL=/bin/bash bash -",
+        "pnpm add -g node-gyp",
+    )
+)
+
+# base_image (Aider, Playwright, node, ...) stays the default for the coding jobs
 app = modal.App(name=config.APP_NAME, image=base_image)
 
 
+# embedded docs for the context enhancer, kept up to date incrementally by
+# the update_context_index function (scripts/update_docs_index.py)
+context_index_volume = modal.Volume.from_name(
+    config.VOLUMES["CONTEXT_INDEX"], create_if_missing=True
+)
+context_index_volumes = {config.PATHS["CONTEXT_INDEX"]: context_index_volume}
+
 volumes = {
     config.PATHS["GITHUB_REPOS"]: modal.Volume.from_name(
         config.VOLUMES["GITHUB_REPOS"], create_if_missing=True
@@ -57,6 +109,7 @@ volumes = {
     config.PATHS["PNPM_STORE"]: modal.Volume.from_name(
         config.VOLUMES["PNPM_STORE"], create_if_missing=True
     ),
+    **context_index_volumes,
 }
 
 all_secrets = [
@@ -76,3 +129,17 @@ all_secrets = [
 db_secrets = [
     modal.Secret.from_name("supabase-secret"),
 ]
+
+kv_secrets = [
+    modal.Secret.from_name("upstash-secret"),
+    modal.Secret.from_name("redis-secret"),
+]
+
+farcaster_secrets = [
+    modal.Secret.from_name("neynar-secret"),
+    modal.Secret.from_name("farcaster-secret"),
+]
+
+vercel_secrets = [
+    modal.Secret.from_name("vercel-secret"),
+]
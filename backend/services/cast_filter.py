@@ -0,0 +1,62 @@
+from typing import Optional
+
+from backend import config
+from backend.integrations.kv import decrement_counter, increment_counter
+from backend.integrations.openrank import get_openrank_score_for_fid
+
+
+def is_project_request(cast: dict) -> bool:
+    """Whether a cast asks us to build a frame."""
+    text = cast.get("text", "").lower()
+    return bool(text) and "build" in text and "frame" in text
+
+
+def get_cast_rejection(cast: dict) -> Optional[str]:
+    """Reply text explaining why a cast can't create a project, None if it can.
+
+    Accepting a cast reserves one of the author's projects for the day, call
+    release_cast_project_quota if the project can't be created after all.
+
+    Raises:
+        Exception: If the author's OpenRank score can't be determined
+    """
+    user_fid = cast["author"]["fid"]
+    openrank_score = get_openrank_score_for_fid(user_fid)
+    print("openrank_score: ", openrank_score)
+    min_percentile = config.CAST_PROJECTS["MIN_OPENRANK_PERCENTILE"]
+    if openrank_score["percentile"] < min_percentile:
+        print(
+            f"user with fid {user_fid} has openrank percentile below {min_percentile}, not creating project. {openrank_score}",
+        )
+        return f"you must be in the top {100 - min_percentile}% of users (based on openrank score) to create a project, while we're testing in alpha. {config.FRONTEND_URL}"
+
+    project_count = increment_counter(
+        get_cast_project_counter_key(user_fid),
+        config.CAST_PROJECTS["RATE_LIMIT_WINDOW"],
+    )
+    if project_count and project_count > config.CAST_PROJECTS["MAX_PER_FID"]:
+        print(f"user with fid {user_fid} is rate limited, not creating project")
+        release_cast_project_quota(cast)
+        return f"you've reached the limit of {config.CAST_PROJECTS['MAX_PER_FID']} projects per day, try again tomorrow or continue on {config.FRONTEND_URL}"
+
+    return None
+
+
+def release_cast_project_quota(cast: dict) -> None:
+    """Give back the project reserved by get_cast_rejection."""
+    decrement_counter(get_cast_project_counter_key(cast["author"]["fid"]))
+
+
+def get_cast_project_counter_key(user_fid: int) -> str:
+    return f"frameception:rate_limit:cast_projects:{user_fid}"
+
+
+def reply_to_rejected_cast(cast: dict, text: str) -> None:
+    from backend.integrations.neynar import NeynarPost
+
+    NeynarPost().reply_to_cast(
+        text=text,
+        parent_hash=cast["hash"],
+        parent_fid=cast["author"]["fid"],
+        embeds=[{"url": config.FRONTEND_URL}],
+    )
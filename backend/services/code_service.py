@@ -1,12 +1,12 @@
 import os
+import time
+import shutil
+import threading
 import modal
-from typing import Optional, Tuple
+from typing import TYPE_CHECKING, Optional, Tuple
 import git
-from aider.coders import Coder
-from aider.models import Model
-from aider.io import InputOutput
 from backend import config
-from backend.modal import base_image
+from backend.modal import sandbox_image
 from backend.integrations.db import Database
 from backend.integrations.github_api import (
     clone_repo_url_to_dir,
@@ -15,7 +15,9 @@ from backend.integrations.github_api import (
 import tempfile
 
 from backend.types import UserContext
-from backend.services.context_enhancer import CodeContextEnhancer
+
+if TYPE_CHECKING:
+    from aider.coders import Coder
 
 DEFAULT_PROJECT_FILES = [
     "src/components/Frame.tsx",
@@ -30,6 +32,9 @@ READONLY_FILES = [
     "spec.md",
 ]
 
+# a reused sandbox needs enough lifetime left for install + build
+SANDBOX_MIN_REMAINING_SECONDS = 300
+
 
 class CodeService:
     def __init__(
@@ -49,11 +54,16 @@ class CodeService:
         self.db = None
         self.is_setup = False
         self.base_image_with_deps = None
+        self.sandbox_synced_sha = None
+        self.sandbox_created_at = None
+        self.sandbox_warmup_thread = None
+        self.sandbox_warmup_error = None
 
         self._setup()
 
     def run(self, prompt: str):
         try:
+            self.start_sandbox_warmup()
             coder = self._create_aider_coder()
 
             print(f"[code_service] Running Aider with prompt: {prompt}")
@@ -61,6 +71,7 @@ class CodeService:
             # prompt = self._enhance_prompt_with_context(prompt)
             aider_result = coder.run(prompt)
             print(f"[code_service] Aider result (truncated): {aider_result[:250]}")
+            self._prepare_sandbox()
             _handle_pnpm_commands(aider_result, self.sandbox)
             has_errors, logs = self._run_build_in_sandbox()
 
@@ -99,17 +110,122 @@ class CodeService:
 
     def terminate_sandbox(self):
         """Safely terminate the sandbox if it exists."""
+        self._wait_for_sandbox_warmup()
         if self.sandbox:
             try:
                 print(f"[code_service] Terminating sandbox - job id {self.job_id}")
                 self.sandbox.terminate()
-                self.sandbox = None
                 print("[code_service] Sandbox terminated")
             except Exception as e:
                 print(f"Error terminating sandbox job id {self.job_id}: {str(e)}")
+            finally:
+                self.sandbox = None
+                self.sandbox_synced_sha = None
+                self.sandbox_created_at = None
+
+    def start_sandbox_warmup(self):
+        """Prepare the build sandbox in the background while Aider is running.
+
+        The sandbox is booted from a snapshot of the current repo so Aider can
+        keep editing the working copy; changed files are synced in afterwards.
+        """
+        self._drop_expiring_sandbox()
+        if self.sandbox or self.sandbox_warmup_thread:
+            return
+
+        print("[code_service] Starting sandbox warm-up in background")
+        snapshot_dir = tempfile.mkdtemp()
+        repo_snapshot_dir = os.path.join(snapshot_dir, "repo")
+        shutil.copytree(self.repo_dir, repo_snapshot_dir, symlinks=True)
+        snapshot_sha = self._get_latest_commit_sha()
+
+        def warm_up():
+            try:
+                self._create_sandbox(repo_dir=repo_snapshot_dir)
+                self.sandbox_synced_sha = snapshot_sha
+                print("[code_service] Sandbox warm-up complete")
+            except Exception as e:
+                print(f"[code_service] Sandbox warm-up failed: {str(e)}")
+                self.sandbox_warmup_error = e
+            finally:
+                shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+        self.sandbox_warmup_error = None
+        self.sandbox_warmup_thread = threading.Thread(target=warm_up, daemon=True)
+        self.sandbox_warmup_thread.start()
+
+    def _wait_for_sandbox_warmup(self):
+        """Block until a pending sandbox warm-up finished (successfully or not)."""
+        if not self.sandbox_warmup_thread:
+            return
+
+        self.sandbox_warmup_thread.join()
+        self.sandbox_warmup_thread = None
+        if self.sandbox_warmup_error:
+            print(
+                "[code_service] Sandbox warm-up unavailable, "
+                f"will create sandbox on demand: {str(self.sandbox_warmup_error)}"
+            )
+            self.sandbox_warmup_error = None
+            self.terminate_sandbox()
+
+    def _drop_expiring_sandbox(self):
+        """Terminate the sandbox if it exited or would time out during the next build.
+
+        Sandboxes are reused across Aider runs and builds of a job, which can
+        take longer than a sandbox lives, so one is recreated when needed.
+        """
+        if not self.sandbox:
+            return
+
+        age = time.time() - self.sandbox_created_at
+        remaining = config.TIMEOUTS["SANDBOX"] - age
+        if self.sandbox.poll() is None and remaining >= SANDBOX_MIN_REMAINING_SECONDS:
+            return
+
+        print(f"[code_service] Replacing sandbox, {int(remaining)}s left or exited")
+        self.terminate_sandbox()
+
+    def _prepare_sandbox(self):
+        """Make sure there's a live sandbox with the current repo state."""
+        self._wait_for_sandbox_warmup()
+        self._drop_expiring_sandbox()
+        if self.sandbox:
+            self._sync_changed_files_to_sandbox()
+        else:
+            self._create_sandbox(repo_dir=self.repo_dir)
+            self.sandbox_synced_sha = self._get_latest_commit_sha()
+
+    def _sync_changed_files_to_sandbox(self):
+        """Copy files changed since the sandbox was created into the sandbox."""
+        repo = git.Repo(path=self.repo_dir)
+        changed_paths = set(
+            repo.git.diff("--name-only", self.sandbox_synced_sha).split("\n")
+        )
+        changed_paths.update(repo.untracked_files)
+        changed_paths.discard("")
+
+        print(f"[code_service] Syncing {len(changed_paths)} changed files to sandbox")
+        for path in sorted(changed_paths):
+            local_path = os.path.join(self.repo_dir, path)
+            remote_path = f"/repo/{path}"
+            if not os.path.exists(local_path):
+                process = self.sandbox.exec("rm", "-rf", remote_path)
+                self.parse_sandbox_process(process, prefix="sync")
+                continue
+
+            self.sandbox.mkdir(os.path.dirname(remote_path), parents=True)
+            with open(local_path, "rb") as local_file:
+                with self.sandbox.open(remote_path, "wb") as remote_file:
+                    remote_file.write(local_file.read())
+
+        self.sandbox_synced_sha = self._get_latest_commit_sha()
 
     def _enhance_prompt_with_context(self, prompt: str) -> str:
         try:
+            # imported here as it loads llama-index, which only this path needs
+            from backend.services.context_enhancer import CodeContextEnhancer
+
             context = CodeContextEnhancer().get_relevant_context(prompt)
             return f"additional context {context}\n\nprompt {prompt}"
         except Exception as e:
@@ -175,7 +291,7 @@ class CodeService:
     ) -> Tuple[bool, str]:
         """Run build commands in an isolated Modal sandbox."""
         try:
-            self._create_sandbox(repo_dir=self.repo_dir)
+            self._prepare_sandbox()
 
             logs = []
             print("[build] Current git status:")
@@ -231,7 +347,7 @@ class CodeService:
         try:
             base_sandbox = modal.Sandbox.create(
                 app=app,
-                image=base_image.add_local_dir(repo_dir, remote_path="/repo"),
+                image=sandbox_image.add_local_dir(repo_dir, remote_path="/repo"),
                 cpu=4,
                 memory=2048,
                 workdir="/repo",
@@ -291,7 +407,8 @@ class CodeService:
         if not self.base_image_with_deps:
             self.base_image_with_deps = self._create_base_image_with_deps(repo_dir)
 
-        self.sandbox = modal.Sandbox.create(
+        created_at = time.time()
+        sandbox = modal.Sandbox.create(
             app=app,
             image=self.base_image_with_deps.add_local_dir(
                 repo_dir, remote_path="/repo"
@@ -299,8 +416,11 @@ class CodeService:
             cpu=2,
             memory=1024,
             workdir="/repo",
-            timeout=config.TIMEOUTS["BUILD"],
+            timeout=config.TIMEOUTS["SANDBOX"],
         )
+        # set first, a sandbox without its creation time can't be checked for expiry
+        self.sandbox_created_at = created_at
+        self.sandbox = sandbox
         self.sandbox.set_tags({"project_id": self.project_id, "job_id": self.job_id})
         self._run_install_in_sandbox()
         print("[code_service] Sandbox created")
@@ -349,8 +469,13 @@ class CodeService:
 
         return logs, exit_code
 
-    def _create_aider_coder(self) -> Coder:
+    def _create_aider_coder(self) -> "Coder":
         """Create and configure the Aider coder instance."""
+        # aider is slow to import, only load it once a coder is needed
+        from aider.coders import Coder
+        from aider.io import InputOutput
+        from aider.models import Model
+
         fnames = [os.path.join(self.repo_dir, f) for f in DEFAULT_PROJECT_FILES]
         llm_docs_dir = os.path.join(self.repo_dir, "llm_docs")
         read_only_fnames = []
@@ -0,0 +1,95 @@
+import os
+import json
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Modal containers read it from the context index volume, see backend/modal.py
+COMPACT_INDEX_PATH = os.getenv(
+    "CONTEXT_INDEX_PATH", "backend/llm_context/compact_index"
+)
+EMBEDDINGS_FILE = "embeddings.npy"
+NODES_FILE = "nodes.json"
+
+
+class CompactVectorStore:
+    """Vector store keeping normalized float32 embeddings in a memory-mapped .npy
+    file next to a small JSON file with node texts and metadata.
+
+    Rows are L2-normalized when persisted, so cosine similarity for all nodes is
+    a single matrix-vector product.
+    """
+
+    def __init__(self, embeddings: np.ndarray, nodes: List[dict]):
+        if len(embeddings) != len(nodes):
+            raise ValueError(f"Got {len(embeddings)} embeddings for {len(nodes)} nodes")
+        self.embeddings = embeddings
+        self.nodes = nodes
+
+    @classmethod
+    def load(cls, path: str = COMPACT_INDEX_PATH) -> "CompactVectorStore":
+        embeddings = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode="r")
+        with open(os.path.join(path, NODES_FILE)) as f:
+            nodes = json.load(f)["nodes"]
+        return cls(embeddings, nodes)
+
+    @classmethod
+    def from_embeddings(
+        cls, embeddings: List[List[float]], nodes: List[dict]
+    ) -> "CompactVectorStore":
+        return cls(normalize_rows(np.asarray(embeddings, dtype=np.float32)), nodes)
+
+    def persist(self, path: str = COMPACT_INDEX_PATH) -> None:
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, EMBEDDINGS_FILE), np.asarray(self.embeddings))
+        with open(os.path.join(path, NODES_FILE), "w") as f:
+            json.dump({"nodes": self.nodes}, f)
+
+    def query(
+        self, embedding: List[float], top_k: int, rows: Optional[List[int]] = None
+    ) -> List[Tuple[float, dict]]:
+        """Top-k nodes by cosine similarity to the query embedding, best first."""
+        return self.query_batch([embedding], top_k, rows)[0]
+
+    def query_batch(
+        self,
+        embeddings: List[List[float]],
+        top_k: int,
+        rows: Optional[List[int]] = None,
+    ) -> List[List[Tuple[float, dict]]]:
+        """Top-k nodes for each query embedding, scored in one matrix product.
+
+        If rows is given, only those rows are scored (e.g. nodes matching a
+        metadata filter).
+        """
+        if rows is None:
+            rows = np.arange(len(self.nodes))
+        if not len(rows):
+            return [[] for _ in embeddings]
+        rows = np.asarray(rows)
+        query_matrix = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        scores = query_matrix @ np.asarray(self.embeddings)[rows].T
+        top_k = min(top_k, scores.shape[1])
+        top_indices = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+
+        results = []
+        for query_scores, query_top_indices in zip(scores, top_indices):
+            ranked = query_top_indices[np.argsort(-query_scores[query_top_indices])]
+            results.append(
+                [(float(query_scores[i]), self.nodes[rows[i]]) for i in ranked]
+            )
+        return results
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def load_compact_vector_store(
+    path: str = COMPACT_INDEX_PATH,
+) -> Optional[CompactVectorStore]:
+    """Load the compact store if it has been generated, otherwise None."""
+    if not os.path.exists(os.path.join(path, EMBEDDINGS_FILE)):
+        return None
+    return CompactVectorStore.load(path)
@@ -0,0 +1,128 @@
+import hashlib
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from llama_index.core.schema import NodeWithScore
+from llama_index.core.utils import get_tokenizer
+
+# a truncated chunk shorter than this is more noise than context
+MIN_TRUNCATED_CHUNK_TOKENS = 50
+# shorter shared text between two chunks is a coincidence, not splitter overlap
+MIN_OVERLAP_CHARS = 32
+
+
+class ContextAssembler:
+    """Builds the context for prompts from retrieved chunks within a token budget.
+
+    Chunks are added best score first. Chunks with identical text are only
+    added once, and the text a chunk shares with an already added neighbouring
+    chunk of the same doc (the splitter's overlap) is trimmed. The chunk that
+    overflows the budget is cut at a line boundary. Token counts use the same
+    tiktoken encoding as llama-index.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int,
+        tokenizer: Optional[Callable[[str], List[int]]] = None,
+    ):
+        self.max_tokens = max_tokens
+        self.tokenizer = tokenizer or get_tokenizer()
+
+    def assemble(self, nodes: List[NodeWithScore]) -> Optional[str]:
+        """Join the best chunks into one context string, or None if there are none."""
+        ranked_nodes = sorted(nodes, key=lambda node: node.score, reverse=True)
+        seen_hashes = set()
+        added_texts_by_doc: Dict[str, List[str]] = defaultdict(list)
+        pieces = []
+        used_tokens = 0
+        duplicate_count = 0
+        dropped_count = 0
+        dropped_tokens = 0
+        truncated_count = 0
+
+        for node in ranked_nodes:
+            text_hash = hashlib.sha256(node.text.encode("utf-8")).hexdigest()
+            if text_hash in seen_hashes:
+                duplicate_count += 1
+                continue
+            seen_hashes.add(text_hash)
+
+            doc = node.metadata.get("file_path")
+            text = node.text
+            if doc:
+                for added_text in added_texts_by_doc[doc]:
+                    text = trim_overlap(text, added_text)
+                added_texts_by_doc[doc].append(node.text)
+            text = text.strip()
+            if not text:
+                duplicate_count += 1
+                continue
+
+            tokens = self._count_tokens(text)
+            remaining_tokens = self.max_tokens - used_tokens
+            if tokens > remaining_tokens:
+                truncated_text = self._truncate(text, remaining_tokens)
+                if not truncated_text:
+                    dropped_count += 1
+                    dropped_tokens += tokens
+                    continue
+                dropped_tokens += tokens - self._count_tokens(truncated_text)
+                text = truncated_text
+                tokens = self._count_tokens(text)
+                truncated_count += 1
+
+            pieces.append(text)
+            used_tokens += tokens
+
+        print(
+            f"context: {len(pieces)} chunks, {used_tokens}/{self.max_tokens} tokens; "
+            f"{duplicate_count} duplicates skipped, {truncated_count} truncated, "
+            f"{dropped_count} dropped, {dropped_tokens} tokens over budget"
+        )
+        return "\n\n".join(pieces) if pieces else None
+
+    def _truncate(self, text: str, max_tokens: int) -> Optional[str]:
+        """Longest prefix of whole lines within max_tokens, or None if too short."""
+        if max_tokens < MIN_TRUNCATED_CHUNK_TOKENS:
+            return None
+        lines = []
+        tokens = 0
+        for line in text.splitlines():
+            line_tokens = self._count_tokens(line + "\n")
+            if tokens + line_tokens > max_tokens:
+                break
+            lines.append(line)
+            tokens += line_tokens
+        if tokens < MIN_TRUNCATED_CHUNK_TOKENS:
+            return None
+        return "\n".join(lines).strip()
+
+    def _count_tokens(self, text: str) -> int:
+        return len(self.tokenizer(text))
+
+
+def trim_overlap(text: str, other: str) -> str:
+    """Remove the text shared with the chunk preceding or following it in a doc.
+
+    Neighbouring chunks of a doc overlap: the end of one is the start of the
+    next. Only such an overlap of at least MIN_OVERLAP_CHARS is removed, so
+    repeated lines elsewhere in a chunk are kept.
+    """
+    overlap = _get_overlap_length(other, text)
+    if overlap:
+        return text[overlap:]
+    overlap = _get_overlap_length(text, other)
+    if overlap:
+        return text[: len(text) - overlap]
+    return text
+
+
+def _get_overlap_length(first: str, second: str) -> int:
+    """Length of the longest end of first that second starts with, 0 if too short."""
+    start = first.find(second[:MIN_OVERLAP_CHARS])
+    while start != -1 and len(second) >= MIN_OVERLAP_CHARS:
+        if second.startswith(first[start:]):
+            return len(first) - start
+        start = first.find(second[:MIN_OVERLAP_CHARS], start + 1)
+    return 0
@@ -1,46 +1,67 @@
 import os
-from typing import Optional
+import functools
+import threading
+from typing import List, Optional, Tuple
+from backend.integrations.kv import get_cached_json, get_content_hash, set_cached_json
 from backend.integrations.llm import (
     generate_search_queries_from_user_input,
 )
+from backend.utils.strings import normalize_prompt
+from backend.utils.ttl_cache import TTLCache
+from backend.services.docs_indexer import IncrementalDocsIndexer
+from backend.services.context_assembler import ContextAssembler
+from backend.services.compact_vector_store import (
+    COMPACT_INDEX_PATH,
+    CompactVectorStore,
+    load_compact_vector_store,
+)
+from backend.services.lexical_index import (
+    BM25Index,
+    load_lexical_index,
+    reciprocal_rank_fusion,
+)
 from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.llms.openai import OpenAI
 from llama_index.llms.openai.utils import DEFAULT_OPENAI_API_BASE
-from llama_index.core import (
-    SimpleDirectoryReader,
-    VectorStoreIndex,
-    Settings,
-    StorageContext,
-    load_index_from_storage,
-)
+from llama_index.core import Settings
+from llama_index.core.schema import NodeWithScore, TextNode
 
-from backend.config import CODE_CONTEXT
+from backend.config import CACHE_TTLS, CODE_CONTEXT, LOCAL_CACHE_SIZES
 
-embed_model = OpenAIEmbedding(
-    model="text-embedding-3-small",
-    api_base=DEFAULT_OPENAI_API_BASE,
-    api_key=os.environ.get("REAL_OPENAI_API_KEY"),
-)
-model = OpenAI(
-    model="gpt-4o-mini",
-    api_base=DEFAULT_OPENAI_API_BASE,
-    api_key=os.environ.get("REAL_OPENAI_API_KEY"),
-)
-
-Settings.embed_model = embed_model
-Settings.model = model
+EMBEDDING_MODEL = "text-embedding-3-small"
 
 PARENT_UPDATE_DOC = "shared.md"
 CONTEXT_DOCS_PATH = "backend/llm_context/docs"
-INDEX_STORAGE_PATH = "backend/llm_context/index"
+RETRIEVAL_TOP_K = 2
+
+search_queries_cache = TTLCache(
+    max_size=LOCAL_CACHE_SIZES["SEARCH_QUERIES"],
+    ttl_seconds=CACHE_TTLS["SEARCH_QUERIES"],
+)
+query_embedding_cache = TTLCache(
+    max_size=LOCAL_CACHE_SIZES["QUERY_EMBEDDING"],
+    ttl_seconds=CACHE_TTLS["QUERY_EMBEDDING"],
+)
+
+index_lock = threading.Lock()
+loaded_compact_store: Optional[CompactVectorStore] = None
+loaded_lexical_index: Optional[BM25Index] = None
+loaded_compact_store_signature: tuple = ()
 
 
 class CodeContextEnhancer:
     def __init__(self):
-        self._prepare_query_engine()
+        self.context_assembler = ContextAssembler(CODE_CONTEXT["MAX_TOKENS"])
+        self.compact_store, self.lexical_index = get_compact_indexes()
 
-    def get_relevant_context(self, user_input: str) -> Optional[str]:
-        """Retrieve context using generated technical queries."""
+    def get_relevant_context(
+        self, user_input: str, apis: Optional[List[str]] = None
+    ) -> Optional[str]:
+        """Retrieve context using generated technical queries.
+
+        Args:
+            user_input: The user's prompt
+            apis: Only search docs of these APIs (e.g. ["neynar"]), all if None
+        """
         if not CODE_CONTEXT["ENABLED"]:
             print("Context enhancement disabled.")
             return None
@@ -48,54 +69,230 @@ class CodeContextEnhancer:
         try:
             if not user_input or not user_input.strip():
                 return None
-            queries = generate_search_queries_from_user_input(user_input=user_input)
-            filename_to_context = dict()
-            for q in queries:
-                response = self.query_engine.query(q)
-                print(f"Search query: {q}, Nodes: {response.source_nodes}")
-                for node in response.source_nodes:
-                    if node.score > CODE_CONTEXT["MIN_RAG_SCORE"]:
-                        filename = node.metadata.get("file_name")
-                        filename_to_context[filename] = node.text
-
-            unique_texts = list(set(filename_to_context.values()))
-            print(f"context pieces: {len(unique_texts)}")
-            context = "\n\n".join(unique_texts) if unique_texts else None
-            print("context length:", len(context))
+            queries = get_search_queries(user_input)
+            if not queries:
+                return None
+
+            try:
+                embeddings = get_query_embeddings(queries)
+            except Exception as e:
+                print(f"Embedding queries failed, using lexical search only: {e}")
+                embeddings = None
+
+            best_nodes = dict()
+            for q, nodes in zip(
+                queries, self._retrieve_nodes(queries, embeddings, apis)
+            ):
+                print(f"Search query: {q}, Nodes: {nodes}")
+                for node in nodes:
+                    best_node = best_nodes.get(node.node_id)
+                    if not best_node or node.score > best_node.score:
+                        best_nodes[node.node_id] = node
+
+            context = self.context_assembler.assemble(list(best_nodes.values()))
+            print("context length:", len(context) if context else 0)
             return context
         except Exception as e:
             print(f"Failed to query context: {e}")
             return None
 
-    def _prepare_query_engine(self):
-        """Dynamically load context pieces from docs directory structure."""
+    def _retrieve_nodes(
+        self,
+        queries: List[str],
+        embeddings: Optional[List[List[float]]],
+        apis: Optional[List[str]] = None,
+    ) -> List[List[NodeWithScore]]:
+        """Relevant nodes for each query, without any LLM calls.
 
-        try:
-            storage_context = StorageContext.from_defaults(
-                persist_dir=INDEX_STORAGE_PATH
+        Vector and BM25 rankings are fused with reciprocal rank fusion.
+        Embeddings may be None if the embedding API is unavailable, in which
+        case only the lexical index is searched.
+        """
+        candidate_count = CODE_CONTEXT["HYBRID_CANDIDATES"]
+        rows = None
+        if apis is not None:
+            rows = [
+                row
+                for row, node in enumerate(self.compact_store.nodes)
+                if node["metadata"].get("api") in apis
+            ]
+
+        if embeddings is None:
+            vector_results = [[] for _ in queries]
+        else:
+            vector_results = self.compact_store.query_batch(
+                embeddings, candidate_count, rows
             )
-            index = load_index_from_storage(storage_context)
-            print(f"Index loaded from {INDEX_STORAGE_PATH}")
-        except Exception as e:
-            print(f"Error loading index: {e}")
-            documents = SimpleDirectoryReader(
-                input_dir=CONTEXT_DOCS_PATH, recursive=True
-            ).load_data()
-
-            # Build a vector index
-            index = VectorStoreIndex.from_documents(documents)
-            index.storage_context.persist(persist_dir=INDEX_STORAGE_PATH)
-            print(f"Index created and stored at {INDEX_STORAGE_PATH}")
-
-        self.query_engine = index.as_query_engine(llm=model, query_kwargs={"top_k": 2})
-
-    def refresh_persisted_index(self):
-        """Rebuild and persist the context index."""
-        documents = SimpleDirectoryReader(
-            input_dir=CONTEXT_DOCS_PATH, recursive=True
-        ).load_data()
-
-        # Build a vector index
-        index = VectorStoreIndex.from_documents(documents)
-        index.storage_context.persist(persist_dir=INDEX_STORAGE_PATH)
-        print(f"Index refreshed and stored at {INDEX_STORAGE_PATH}")
+
+        results = []
+        for query, query_vector_results in zip(queries, vector_results):
+            nodes_by_id = {}
+            vector_ranking = []
+            for score, node in query_vector_results:
+                if score > CODE_CONTEXT["MIN_RAG_SCORE"]:
+                    vector_ranking.append(node["id"])
+                    nodes_by_id[node["id"]] = node
+
+            lexical_ranking = []
+            if self.lexical_index:
+                for _, row in self.lexical_index.query(query, candidate_count, rows):
+                    node = self.compact_store.nodes[row]
+                    lexical_ranking.append(node["id"])
+                    nodes_by_id[node["id"]] = node
+
+            fused = reciprocal_rank_fusion(
+                [vector_ranking, lexical_ranking], k=CODE_CONTEXT["RRF_K"]
+            )
+            results.append(
+                [
+                    NodeWithScore(
+                        node=TextNode(
+                            id_=node_id,
+                            text=nodes_by_id[node_id]["text"],
+                            metadata=nodes_by_id[node_id]["metadata"],
+                        ),
+                        score=score,
+                    )
+                    for node_id, score in fused[:RETRIEVAL_TOP_K]
+                ]
+            )
+        return results
+
+    def refresh_persisted_index(self) -> CompactVectorStore:
+        """Update the persisted context index with changed docs."""
+        return update_docs_index()
+
+
+@functools.lru_cache(maxsize=1)
+def get_embed_model() -> OpenAIEmbedding:
+    """Get the embedding model, created on first use rather than at import time."""
+    embed_model = OpenAIEmbedding(
+        model=EMBEDDING_MODEL,
+        api_base=DEFAULT_OPENAI_API_BASE,
+        api_key=os.environ.get("REAL_OPENAI_API_KEY"),
+    )
+    Settings.embed_model = embed_model
+    return embed_model
+
+
+def update_docs_index() -> CompactVectorStore:
+    """Embed new or changed docs into the compact index and drop removed ones."""
+    indexer = IncrementalDocsIndexer(
+        get_embed_model(),
+        embedding_model_name=EMBEDDING_MODEL,
+        docs_path=CONTEXT_DOCS_PATH,
+        index_path=COMPACT_INDEX_PATH,
+    )
+    store = indexer.update()
+    print(f"Index refreshed and stored at {COMPACT_INDEX_PATH}")
+    return store
+
+
+def preload_context_index():
+    """Load the context index, e.g. at container start."""
+    get_compact_indexes()
+
+
+def get_compact_indexes() -> Tuple[CompactVectorStore, Optional[BM25Index]]:
+    """Like load_compact_indexes, but the vector store is required.
+
+    Raises:
+        FileNotFoundError: If the index wasn't generated, see scripts/update_docs_index.py
+    """
+    compact_store, lexical_index = load_compact_indexes()
+    if not compact_store:
+        raise FileNotFoundError(
+            f"No context index at {COMPACT_INDEX_PATH}, "
+            "build it with scripts/update_docs_index.py"
+        )
+    return compact_store, lexical_index
+
+
+def load_compact_indexes() -> Tuple[Optional[CompactVectorStore], Optional[BM25Index]]:
+    """Get the compact vector store and its lexical index, loaded once per process.
+
+    Either is None if it hasn't been generated. A lexical index that doesn't
+    match the nodes of the vector store is ignored.
+    """
+    global loaded_compact_store, loaded_lexical_index, loaded_compact_store_signature
+
+    with index_lock:
+        signature = _get_index_files_signature(COMPACT_INDEX_PATH)
+        if signature != loaded_compact_store_signature:
+            loaded_compact_store = load_compact_vector_store(COMPACT_INDEX_PATH)
+            loaded_lexical_index = load_lexical_index(COMPACT_INDEX_PATH)
+            loaded_compact_store_signature = signature
+            if loaded_compact_store:
+                print(f"Compact index loaded from {COMPACT_INDEX_PATH}")
+            if loaded_lexical_index and (
+                not loaded_compact_store
+                or loaded_lexical_index.node_ids
+                != [node["id"] for node in loaded_compact_store.nodes]
+            ):
+                print("Lexical index is out of sync with the vector store, ignoring")
+                loaded_lexical_index = None
+        return loaded_compact_store, loaded_lexical_index
+
+
+def _get_index_files_signature(path: str) -> tuple:
+    """Names, sizes and modification times of the persisted index files."""
+    if not os.path.isdir(path):
+        return ()
+    signature = []
+    for entry in sorted(os.scandir(path), key=lambda e: e.name):
+        if entry.is_file():
+            stat = entry.stat()
+            signature.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+def get_search_queries(user_input: str) -> List[str]:
+    """Generate search queries, cached by normalized prompt in memory and in KV."""
+    prompt_hash = get_content_hash(normalize_prompt(user_input))
+    cache_key = f"frameception:context:queries:{prompt_hash}"
+    queries = search_queries_cache.get(cache_key)
+    if queries is None:
+        queries = get_cached_json(cache_key)
+
+    if queries is None:
+        queries = generate_search_queries_from_user_input(user_input=user_input)
+        # an empty list is also returned when query generation fails, so don't cache it
+        if not queries:
+            return queries
+        set_cached_json(cache_key, queries, ttl_seconds=CACHE_TTLS["SEARCH_QUERIES"])
+
+    search_queries_cache.set(cache_key, queries)
+    return queries
+
+
+def get_query_embeddings(queries: List[str]) -> List[List[float]]:
+    """Embed search queries, cached by query text in memory and in KV.
+
+    All queries missing from the caches are embedded in a single batch request.
+    """
+    cache_keys = [get_query_embedding_cache_key(query) for query in queries]
+    embeddings = []
+    for cache_key in cache_keys:
+        embedding = query_embedding_cache.get(cache_key)
+        if embedding is None:
+            embedding = get_cached_json(cache_key)
+        embeddings.append(embedding)
+
+    missing_indices = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if missing_indices:
+        missing_queries = [queries[i] for i in missing_indices]
+        new_embeddings = get_embed_model().get_text_embedding_batch(missing_queries)
+        for i, embedding in zip(missing_indices, new_embeddings):
+            embeddings[i] = embedding
+            set_cached_json(
+                cache_keys[i], embedding, ttl_seconds=CACHE_TTLS["QUERY_EMBEDDING"]
+            )
+
+    for cache_key, embedding in zip(cache_keys, embeddings):
+        query_embedding_cache.set(cache_key, embedding)
+    return embeddings
+
+
+def get_query_embedding_cache_key(query: str) -> str:
+    query_hash = get_content_hash(query)
+    return f"frameception:context:embedding:{EMBEDDING_MODEL}:{query_hash}"
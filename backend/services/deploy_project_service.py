@@ -1,13 +1,20 @@
 import os
-import time
-import requests
+import re
 import json
+from backend import config
 from backend.integrations.db import Database
 from backend.services.code_service import CodeService
+from backend.services.deployment_watch import (
+    register_pending_deployment,
+    wait_for_deployment,
+)
 from backend.utils.farcaster import generate_domain_association
 from backend.types import UserContext
 
-DEPLOYMENT_COMPLETE_COMMIT_MESSAGE = "Deployment complete"
+FARCASTER_MANIFEST_PATH = "src/app/.well-known/farcaster.json/route.ts"
+ACCOUNT_ASSOCIATION_PATTERN = re.compile(
+    r"^([ \t]*)accountAssociation:\s*\{[^{}]*\}", re.MULTILINE
+)
 
 
 class DeployProjectService:
@@ -28,38 +35,14 @@ class DeployProjectService:
             self._setup_domain_association()
             self._ensure_build_success()
 
-            self._push_commit_to_show_deployment_is_done()
-            self._wait_for_vercel_build()
-
-            self.db.update_project(
-                self.project_id,
-                {
-                    "status": "deployed",
-                },
-            )
-            self.db.update_job_status(self.job_id, "completed")
-            self._log("Deployment completed successfully")
-
-            # import on top of file fails even though we have farcaster-py installed
-            from backend.integrations.neynar import NeynarPost
-            from backend.integrations.farcaster_notifications import send_notification
+            pending_deployment = self._push_commit_to_show_deployment_is_done()
+            self.code_service.terminate_sandbox()
 
-            send_notification(
-                fid=self.user_context["fid"],
-                title=f"Your {self.project.get('name')} frame is ready!",
-                body="@maschine prepared your frame. You can share it now! 🚀",
+            # the build takes minutes, finish the deployment once Vercel is done
+            self._log(
+                f"Waiting for Vercel build completion for {pending_deployment['commit_sha']}"
             )
-            parent_hash = self.project.get("data", {}).get("cast", {}).get("hash")
-            url = self.project.get("frontend_url")
-            if parent_hash and url:
-                user_fid = self.project.get("fid_owner")
-                NeynarPost().reply_to_cast(
-                    text=f"your frame is ready! 🚀 {url}",
-                    parent_hash=parent_hash,
-                    parent_fid=user_fid,
-                    embeds=[{"url": url}],
-                )
-            self.code_service.terminate_sandbox()
+            wait_for_deployment(pending_deployment)
         except Exception as e:
             self.code_service.terminate_sandbox()
             self._log(f"Deployment failed: {str(e)}", "error")
@@ -86,76 +69,65 @@ class DeployProjectService:
             )
         raise Exception("Failed to resolve build errors after 3 attempts")
 
-    def _push_commit_to_show_deployment_is_done(self):
-        self.code_service._create_commit(DEPLOYMENT_COMPLETE_COMMIT_MESSAGE)
-        self.code_service._sync_git_changes()
+    def _push_commit_to_show_deployment_is_done(self) -> dict:
+        """Push the final commit and return the deployment waiting for its build.
 
-    def _wait_for_vercel_build(self):
-        """Wait for Vercel build to complete using API polling"""
-        latest_commit_sha = self.code_service._get_latest_commit_sha()
-
-        self._log(f"Waiting for Vercel build completion for {latest_commit_sha}")
-        vercel_token = os.getenv("VERCEL_TOKEN")
-        team_id = os.getenv("VERCEL_TEAM_ID")
-        project_id = self.project.get("vercel_project_id")
-        max_wait_seconds = 600  # 10 minutes
-        start_time = time.time()
-
-        if not all([vercel_token, team_id, project_id]):
+        The deployment is registered before pushing, so a fast Vercel webhook
+        can't arrive before anyone waits for it.
+        """
+        vercel_project_id = self.project.get("vercel_project_id")
+        if not vercel_project_id:
             raise ValueError("Missing required Vercel configuration")
 
-        while time.time() - start_time < max_wait_seconds:
-            try:
-                # Get latest deployment
-                response = requests.get(
-                    "https://api.vercel.com/v6/deployments",
-                    params={
-                        "projectId": project_id,
-                        "teamId": team_id,
-                        "limit": 1,
-                        "meta-githubCommitSha": latest_commit_sha,
-                    },
-                    headers={
-                        "Authorization": f"Bearer {vercel_token}",
-                    },
-                )
-                response.raise_for_status()
-
-                deployments = response.json().get("deployments", [])
-                if not deployments:
-                    self._log("No deployments found yet")
-                    time.sleep(5)
-                    continue
-
-                latest_deployment = deployments[0]
-                status = latest_deployment.get("readyState")
-
-                if status == "READY":
-                    self._log("Vercel deployment completed successfully")
-                    return
-                elif status == "ERROR":
-                    error_message = latest_deployment.get(
-                        "errorMessage", "Unknown error"
-                    )
-                    raise Exception(f"Vercel deployment failed: {error_message}")
-                else:
-                    self._log(f"Build in progress (status: {status}), waiting...")
-                    time.sleep(10)
-
-            except requests.exceptions.RequestException as e:
-                raise Exception(f"Vercel API error: {str(e)}")
-
-        raise TimeoutError("Vercel build did not complete within expected timeframe")
+        self.code_service._create_commit(config.DEPLOYMENT_COMPLETE_COMMIT_MESSAGE)
+        pending_deployment = {
+            "project_id": self.project_id,
+            "job_id": self.job_id,
+            "user_context": self.user_context,
+            "vercel_project_id": vercel_project_id,
+            "commit_sha": self.code_service._get_latest_commit_sha(),
+        }
+        register_pending_deployment(pending_deployment)
+        self.code_service._sync_git_changes()
+        return pending_deployment
 
     def _setup_domain_association(self):
         """setup domain association for farcaster frame v2 to reflect user connection to new vercel domain"""
         self._log("Setting up domain association")
-        print("should call update_code function via modal lookup here")
-        domain = self.project.get("frontend_url").replace("https://", "")
-        domain_association = generate_domain_association(domain)
+        project_data = self.project.get("data") or {}
+        domain_association = project_data.get("domain_association")
+        if not domain_association:
+            # projects created before the association was signed at setup
+            domain = project_data.get("domain") or self.project.get(
+                "frontend_url"
+            ).replace("https://", "")
+            domain_association = generate_domain_association(domain)
+
+        # it's a JSON blob in a known place, no need to have Aider write it
+        manifest_file = os.path.join(
+            self.code_service.repo_dir, FARCASTER_MANIFEST_PATH
+        )
+        manifest = ""
+        if os.path.exists(manifest_file):
+            with open(manifest_file) as f:
+                manifest = f.read()
+        association_json = json.dumps(domain_association, indent=2)
+        manifest, count = ACCOUNT_ASSOCIATION_PATTERN.subn(
+            lambda match: match.group(1)
+            + "accountAssociation: "
+            + association_json.replace("\n", "\n" + match.group(1)),
+            manifest,
+            count=1,
+        )
+        if count:
+            with open(manifest_file, "w") as f:
+                f.write(manifest)
+            self.code_service._create_commit("Update domain association")
+            return
+
         update_domain_association_prompt = f"""
-        Update src/app/.well-known/farcaster.json/route.ts so that the 'accountAssociation' field returns the following domain association:
-        {json.dumps(domain_association, indent=2)}
+        Update {FARCASTER_MANIFEST_PATH} so that the 'accountAssociation' field returns the following domain association:
+        {association_json}
         Only update the accountAssociation field.
         """
         self._run_code_update(update_domain_association_prompt)
@@ -0,0 +1,224 @@
+import os
+import hmac
+import time
+import random
+import hashlib
+from typing import Callable, Optional
+
+import requests
+
+from backend import config
+from backend.integrations.db import get_database
+from backend.integrations.kv import get_cached_json, pop_cached_json, set_cached_json
+
+VERCEL_DEPLOYMENTS_URL = "https://api.vercel.com/v6/deployments"
+
+# adaptive polling: builds take minutes, so start fast and back off
+POLL_INITIAL_INTERVAL_SECONDS = 5
+POLL_MAX_INTERVAL_SECONDS = 30
+POLL_BACKOFF_FACTOR = 1.5
+POLL_JITTER = 0.2
+
+
+class VercelDeploymentPoller:
+    """Polls the Vercel deployment of a commit until it's ready or failed.
+
+    Polls back off exponentially with jitter. Network errors, 429s and 5xx
+    responses that outlast the session's retries are retried on the next poll
+    instead of failing the deployment.
+    """
+
+    def __init__(self, vercel_project_id: str, commit_sha: str):
+        # vercel_api needs eth-account, which the slim webhook image lacks
+        from backend.integrations.vercel_api import get_vercel_session
+
+        self.vercel_project_id = vercel_project_id
+        self.commit_sha = commit_sha
+        self.team_id = os.environ["VERCEL_TEAM_ID"]
+        self.session = get_vercel_session()
+
+    def wait(
+        self, timeout_seconds: int, should_stop: Optional[Callable[[], bool]] = None
+    ) -> Optional[dict]:
+        """Wait for the deployment to be ready and return it.
+
+        Returns None without waiting any longer once should_stop returns True.
+
+        Raises:
+            Exception: If the deployment failed or was canceled
+            TimeoutError: If it isn't ready within timeout_seconds
+        """
+        deadline = time.time() + timeout_seconds
+        interval = POLL_INITIAL_INTERVAL_SECONDS
+        while time.time() < deadline:
+            if should_stop and should_stop():
+                return None
+            deployment = self._get_deployment()
+            state = deployment.get("readyState") if deployment else None
+            if state == "READY":
+                return deployment
+            if state in ("ERROR", "CANCELED"):
+                error_message = deployment.get("errorMessage", state)
+                raise Exception(f"Vercel deployment failed: {error_message}")
+
+            print(f"Vercel deployment of {self.commit_sha}: {state or 'not found yet'}")
+            jitter = random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+            time.sleep(max(0, min(interval * jitter, deadline - time.time())))
+            interval = min(interval * POLL_BACKOFF_FACTOR, POLL_MAX_INTERVAL_SECONDS)
+
+        raise TimeoutError("Vercel build did not complete within expected timeframe")
+
+    def _get_deployment(self) -> Optional[dict]:
+        """Latest deployment of the commit, None if there's none or on transient errors."""
+        try:
+            response = self.session.get(
+                VERCEL_DEPLOYMENTS_URL,
+                params={
+                    "projectId": self.vercel_project_id,
+                    "teamId": self.team_id,
+                    "limit": 1,
+                    "meta-githubCommitSha": self.commit_sha,
+                },
+                timeout=config.TIMEOUTS["VERCEL_API"],
+            )
+        except requests.RequestException as e:
+            print(f"Vercel API request failed, retrying: {str(e)}")
+            return None
+
+        if response.status_code == 429 or response.status_code >= 500:
+            print(f"Vercel API returned {response.status_code}, retrying")
+            return None
+        if not response.ok:
+            raise Exception(f"Vercel API error: {response.text}")
+
+        deployments = response.json().get("deployments", [])
+        return deployments[0] if deployments else None
+
+
+def register_pending_deployment(pending_deployment: dict) -> None:
+    """Remember a deployment for the vercel-webhook endpoint, if webhooks are set up.
+
+    Args:
+        pending_deployment: project_id, job_id, user_context, vercel_project_id
+            and commit_sha of the deployment
+    """
+    if not is_vercel_webhook_enabled():
+        return
+    set_cached_json(
+        get_pending_deployment_key(
+            pending_deployment["vercel_project_id"], pending_deployment["commit_sha"]
+        ),
+        pending_deployment,
+        ttl_seconds=config.CACHE_TTLS["PENDING_DEPLOYMENT"],
+    )
+
+
+def wait_for_deployment(pending_deployment: dict) -> None:
+    """Make sure a pushed deployment gets finished, without waiting for its build.
+
+    A slim watcher function polls the Vercel API until its deadline. With
+    Vercel webhooks the vercel-webhook endpoint usually finishes first, the
+    watcher is the fallback for lost or delayed webhook deliveries.
+    """
+    import modal
+
+    watch_function = modal.Function.lookup(
+        config.APP_NAME, config.MODAL_WATCH_DEPLOYMENT_FUNCTION_NAME
+    )
+    watch_function.spawn(pending_deployment)
+
+
+def is_vercel_webhook_enabled() -> bool:
+    return bool(os.getenv("VERCEL_WEBHOOK_SECRET"))
+
+
+def watch_deployment(pending_deployment: dict) -> None:
+    """Poll Vercel until the deployment is done, then finish it.
+
+    With webhooks enabled the deployment is only finished if the webhook
+    hasn't taken it already, and polling stops as soon as it has.
+    """
+    vercel_project_id = pending_deployment["vercel_project_id"]
+    commit_sha = pending_deployment["commit_sha"]
+
+    def is_finished_by_webhook() -> bool:
+        return is_vercel_webhook_enabled() and not get_cached_json(
+            get_pending_deployment_key(vercel_project_id, commit_sha)
+        )
+
+    poller = VercelDeploymentPoller(vercel_project_id, commit_sha)
+    error = None
+    try:
+        poller.wait(
+            config.TIMEOUTS["VERCEL_DEPLOYMENT"], should_stop=is_finished_by_webhook
+        )
+    except Exception as e:
+        error = str(e)
+
+    if is_vercel_webhook_enabled() and not pop_pending_deployment(
+        vercel_project_id, commit_sha
+    ):
+        print(f"deployment {commit_sha} was finished by webhook")
+        return
+    finish_deployment(pending_deployment, error=error)
+
+
+def pop_pending_deployment(vercel_project_id: str, commit_sha: str) -> Optional[dict]:
+    """Take the pending deployment of a commit, so it's finished only once."""
+    return pop_cached_json(get_pending_deployment_key(vercel_project_id, commit_sha))
+
+
+def get_pending_deployment_key(vercel_project_id: str, commit_sha: str) -> str:
+    return f"frameception:vercel:pending_deployment:{vercel_project_id}:{commit_sha}"
+
+
+def verify_vercel_signature(body: bytes, signature: str) -> bool:
+    """Check the x-vercel-signature header (HMAC-SHA1 of the raw body)."""
+    secret = os.getenv("VERCEL_WEBHOOK_SECRET", "")
+    if not secret:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha1).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def finish_deployment(pending_deployment: dict, error: Optional[str] = None) -> None:
+    """Mark the project deployed and tell the user, or record the failure."""
+    db = get_database()
+    project_id = pending_deployment["project_id"]
+    job_id = pending_deployment["job_id"]
+
+    if error:
+        db.add_log(job_id, "deploy", f"Deployment failed: {error}")
+        db.update_project(project_id, {"status": "deploy_failed"})
+        db.update_job_status(job_id, "failed", error)
+        return
+
+    project = db.get_project(project_id)
+    update_project_data = {"status": "deployed"}
+    # the domain is assigned at setup, but only worth linking once it's live
+    domain = (project.get("data") or {}).get("domain")
+    if domain:
+        update_project_data["frontend_url"] = f"https://{domain}"
+    db.update_project(project_id, update_project_data)
+    db.update_job_status(job_id, "completed")
+    db.add_log(job_id, "deploy", "Deployment completed successfully")
+
+    # import on top of file fails even though we have farcaster-py installed
+    from backend.integrations.neynar import NeynarPost
+    from backend.integrations.farcaster_notifications import send_notification
+
+    project = {**project, **update_project_data}
+    send_notification(
+        fid=pending_deployment["user_context"]["fid"],
+        title=f"Your {project.get('name')} frame is ready!",
+        body="@maschine prepared your frame. You can share it now! 🚀",
+    )
+    parent_hash = project.get("data", {}).get("cast", {}).get("hash")
+    url = project.get("frontend_url")
+    if parent_hash and url:
+        NeynarPost().reply_to_cast(
+            text=f"your frame is ready! 🚀 {url}",
+            parent_hash=parent_hash,
+            parent_fid=project.get("fid_owner"),
+            embeds=[{"url": url}],
+        )
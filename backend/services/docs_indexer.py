@@ -0,0 +1,192 @@
+import os
+import json
+import hashlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+import yaml
+from llama_index.core import Document
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import MetadataMode
+
+from backend.services.compact_vector_store import (
+    COMPACT_INDEX_PATH,
+    CompactVectorStore,
+    load_compact_vector_store,
+    normalize_rows,
+)
+from backend.services.lexical_index import BM25Index
+
+MANIFEST_FILE = "manifest.json"
+# bump when chunking or node metadata changes, so every doc is re-indexed
+INDEX_FORMAT_VERSION = 2
+
+
+class IncrementalDocsIndexer:
+    """Keeps the compact vector store in sync with the docs directory.
+
+    A manifest next to the index records a content hash and the node ids of
+    every doc file. On update only new or changed docs are chunked and embedded
+    (in batches); nodes of removed docs are dropped and everything else is
+    reused as is. The BM25 lexical index is rebuilt from the nodes, which needs
+    no embedding calls.
+
+    Every node gets the doc's top-level directory as its `api` metadata, plus
+    any fields from a YAML front matter block (method, path, tags, ...) so
+    retrieval can filter on them.
+    """
+
+    def __init__(
+        self,
+        embed_model,
+        embedding_model_name: str,
+        docs_path: str,
+        index_path: str = COMPACT_INDEX_PATH,
+    ):
+        self.embed_model = embed_model
+        self.embedding_model_name = embedding_model_name
+        self.docs_path = docs_path
+        self.index_path = index_path
+        self.node_parser = SentenceSplitter()
+
+    def update(self) -> CompactVectorStore:
+        """Bring the index up to date with the docs and persist it."""
+        doc_hashes = self._get_doc_hashes()
+        manifest = self._load_manifest()
+        store = load_compact_vector_store(self.index_path)
+        is_compatible = (
+            manifest.get("embedding_model") == self.embedding_model_name
+            and manifest.get("version") == INDEX_FORMAT_VERSION
+        )
+        if not is_compatible or not store:
+            manifest, store = {"docs": {}}, None
+
+        existing_rows = (
+            {node["id"]: i for i, node in enumerate(store.nodes)} if store else {}
+        )
+        kept_rows = []
+        docs_manifest = {}
+        changed_docs = []
+        for doc_path, doc_hash in doc_hashes.items():
+            previous = manifest["docs"].get(doc_path)
+            is_unchanged = (
+                previous
+                and previous["hash"] == doc_hash
+                and all(node_id in existing_rows for node_id in previous["node_ids"])
+            )
+            if is_unchanged:
+                kept_rows.extend(
+                    existing_rows[node_id] for node_id in previous["node_ids"]
+                )
+                docs_manifest[doc_path] = previous
+            else:
+                changed_docs.append(doc_path)
+
+        removed_docs = set(manifest["docs"]) - set(doc_hashes)
+        print(
+            f"Docs index: {len(docs_manifest)} unchanged, {len(changed_docs)} "
+            f"new or changed, {len(removed_docs)} removed"
+        )
+
+        new_nodes = []
+        for doc_path in changed_docs:
+            doc_nodes = self._chunk_doc(doc_path, doc_hashes[doc_path])
+            docs_manifest[doc_path] = {
+                "hash": doc_hashes[doc_path],
+                "node_ids": [node.node_id for node in doc_nodes],
+            }
+            new_nodes.extend(doc_nodes)
+
+        embedding_parts = []
+        nodes = []
+        if kept_rows:
+            embedding_parts.append(np.asarray(store.embeddings)[kept_rows])
+            nodes.extend(store.nodes[i] for i in kept_rows)
+        if new_nodes:
+            embedding_parts.append(self._embed_nodes(new_nodes))
+            nodes.extend(
+                {"id": node.node_id, "text": node.text, "metadata": node.metadata}
+                for node in new_nodes
+            )
+
+        embeddings = (
+            np.vstack(embedding_parts)
+            if embedding_parts
+            else np.zeros((0, 0), dtype=np.float32)
+        )
+        updated_store = CompactVectorStore(embeddings, nodes)
+        updated_store.persist(self.index_path)
+        BM25Index.from_nodes(nodes).persist(self.index_path)
+        self._write_manifest(
+            {
+                "embedding_model": self.embedding_model_name,
+                "version": INDEX_FORMAT_VERSION,
+                "docs": docs_manifest,
+            }
+        )
+        return updated_store
+
+    def _embed_nodes(self, nodes: List) -> np.ndarray:
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        print(f"Docs index: embedding {len(texts)} chunks")
+        embeddings = self.embed_model.get_text_embedding_batch(texts)
+        return normalize_rows(np.asarray(embeddings, dtype=np.float32))
+
+    def _chunk_doc(self, doc_path: str, doc_hash: str) -> List:
+        with open(os.path.join(self.docs_path, doc_path), encoding="utf-8") as f:
+            front_matter, text = parse_front_matter(f.read())
+        path_parts = doc_path.split(os.sep)
+        metadata = {
+            "file_name": os.path.basename(doc_path),
+            "file_path": doc_path,
+            "api": path_parts[0] if len(path_parts) > 1 else "",
+        }
+        metadata.update(front_matter)
+        document = Document(text=text, metadata=metadata)
+        nodes = self.node_parser.get_nodes_from_documents([document])
+        for i, node in enumerate(nodes):
+            node.id_ = f"{doc_path}#{doc_hash[:12]}#{i}"
+        return nodes
+
+    def _get_doc_hashes(self) -> Dict[str, str]:
+        """Content hash per doc file, keyed by path relative to the docs dir."""
+        doc_hashes = {}
+        for root, dirs, files in os.walk(self.docs_path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for file_name in sorted(files):
+                if file_name.startswith("."):
+                    continue
+                file_path = os.path.join(root, file_name)
+                with open(file_path, "rb") as f:
+                    doc_hash = hashlib.sha256(f.read()).hexdigest()
+                doc_hashes[os.path.relpath(file_path, self.docs_path)] = doc_hash
+        return doc_hashes
+
+    def _load_manifest(self) -> dict:
+        manifest_path = os.path.join(self.index_path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return {"docs": {}}
+        with open(manifest_path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest: dict) -> None:
+        with open(os.path.join(self.index_path, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def parse_front_matter(text: str) -> Tuple[dict, str]:
+    """Split a leading `---` YAML block from a doc into (metadata, body).
+
+    Lists are joined with commas so all values stay flat strings.
+    """
+    if not text.startswith("---\n"):
+        return {}, text
+    end = text.find("\n---\n", 4)
+    if end == -1:
+        return {}, text
+    front_matter = yaml.safe_load(text[4:end]) or {}
+    metadata = {
+        key: ", ".join(map(str, value)) if isinstance(value, list) else str(value)
+        for key, value in front_matter.items()
+    }
+    return metadata, text[end + len("\n---\n") :]
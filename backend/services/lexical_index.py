@@ -0,0 +1,134 @@
+import os
+import re
+import json
+import math
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+LEXICAL_INDEX_FILE = "bm25.json"
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in",
+    "is", "it", "of", "on", "or", "that", "the", "this", "to", "with",
+}  # fmt: skip
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens, keeping identifiers whole and also split up.
+
+    `fetchBulkCasts` yields `fetchbulkcasts`, `fetch`, `bulk` and `casts`, so
+    both exact operationIds and their words match.
+    """
+    tokens = []
+    for word in re.findall(r"[A-Za-z0-9]+", text):
+        lowered = word.lower()
+        if lowered not in STOPWORDS:
+            tokens.append(lowered)
+        parts = re.findall(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+", word)
+        if len(parts) > 1:
+            tokens.extend(p.lower() for p in parts if p.lower() not in STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """Inverted index with BM25 scoring over the nodes of the compact store.
+
+    Documents are referenced by their row in the compact store, so lexical and
+    vector results can be fused by node id. Works without any network access.
+    """
+
+    def __init__(
+        self,
+        node_ids: List[str],
+        doc_lengths: List[int],
+        postings: Dict[str, List[Tuple[int, int]]],
+    ):
+        self.node_ids = node_ids
+        self.doc_lengths = doc_lengths
+        self.postings = postings
+        self.average_doc_length = (
+            sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+        )
+
+    @classmethod
+    def from_nodes(cls, nodes: List[dict]) -> "BM25Index":
+        doc_lengths = []
+        postings = defaultdict(list)
+        for doc_index, node in enumerate(nodes):
+            file_name = node.get("metadata", {}).get("file_name", "")
+            term_counts = Counter(tokenize(f"{file_name} {node['text']}"))
+            doc_lengths.append(sum(term_counts.values()))
+            for term, count in term_counts.items():
+                postings[term].append((doc_index, count))
+        return cls([node["id"] for node in nodes], doc_lengths, dict(postings))
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(os.path.join(path, LEXICAL_INDEX_FILE)) as f:
+            data = json.load(f)
+        return cls(data["node_ids"], data["doc_lengths"], data["postings"])
+
+    def persist(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, LEXICAL_INDEX_FILE), "w") as f:
+            json.dump(
+                {
+                    "node_ids": self.node_ids,
+                    "doc_lengths": self.doc_lengths,
+                    "postings": self.postings,
+                },
+                f,
+            )
+
+    def query(
+        self, text: str, top_k: int, rows: Optional[List[int]] = None
+    ) -> List[Tuple[float, int]]:
+        """Top-k (score, row) pairs for the query, best first.
+
+        If rows is given, only those rows can be returned.
+        """
+        allowed_rows = set(rows) if rows is not None else None
+        doc_count = len(self.doc_lengths)
+        scores = defaultdict(float)
+        for term in set(tokenize(text)):
+            term_postings = self.postings.get(term, [])
+            if not term_postings:
+                continue
+            idf = math.log(
+                1 + (doc_count - len(term_postings) + 0.5) / (len(term_postings) + 0.5)
+            )
+            for doc_index, count in term_postings:
+                if allowed_rows is not None and doc_index not in allowed_rows:
+                    continue
+                length_norm = (
+                    1
+                    - BM25_B
+                    + BM25_B * (self.doc_lengths[doc_index] / self.average_doc_length)
+                )
+                scores[doc_index] += (
+                    idf * count * (BM25_K1 + 1) / (count + BM25_K1 * length_norm)
+                )
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [(score, doc_index) for doc_index, score in ranked[:top_k]]
+
+
+def load_lexical_index(path: str) -> Optional[BM25Index]:
+    """Load the lexical index if it has been generated, otherwise None."""
+    if not os.path.exists(os.path.join(path, LEXICAL_INDEX_FILE)):
+        return None
+    return BM25Index.load(path)
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[str]], k: int
+) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: each id scores sum(1 / (k + rank)) over the lists."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] += 1 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
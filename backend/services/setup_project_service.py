@@ -67,27 +67,58 @@ class SetupProjectService:
 
     def _add_brainstorm_docs_to_repo(self, code_service: CodeService, prompt: str):
         print('Adding brainstormed docs to repo')
-        context = CodeContextEnhancer().get_relevant_context(prompt)
-        
-        print('got context, now sending prompt to reasoning model')
-        create_spec = CREATE_SPEC_PROMPT.format(context=context, prompt=prompt)
-        spec_content, spec_reasoning = send_prompt_to_reasoning_model(create_spec)
-        print(f"Received spec content: {spec_content}\nReasoning: {spec_reasoning}")
-        code_service._add_file_to_repo_dir("spec.md", create_spec)
-
-        create_plan = CREATE_SPEC_FROM_PLAN_PROMPT.format(spec=create_spec)
-        plan_content, plan_reasoning = send_prompt_to_reasoning_model(create_plan)
-        print(f"Received plan content: {plan_content}\nReasoning: {plan_reasoning}")
-        code_service._add_file_to_repo_dir("plan.md", plan_content)
-
-        todo = CREATE_TODO_LIST_PROMPT.format(plan=create_plan)
-        todo_content, todo_reasoning = send_prompt_to_reasoning_model(todo)
-        print(f"Received todo content: {todo_content}\nReasoning: {todo_reasoning}")
-        code_service._add_file_to_repo_dir("todo.md", content=todo_content)
+        context = CodeContextEnhancer().get_relevant_context(
+            prompt, self.data.get("apis")
+        )
+
+        print('got context, now sending prompts to reasoning model')
+        # each doc is written from the previous one, so the prompts run in order;
+        # the build sandbox for the following Aider runs warms up meanwhile
+        code_service.start_sandbox_warmup()
+
+        spec_content = self._write_brainstorm_doc(
+            code_service,
+            "spec.md",
+            CREATE_SPEC_PROMPT.format(context=context, prompt=prompt),
+        )
+        plan_content = self._write_brainstorm_doc(
+            code_service,
+            "plan.md",
+            CREATE_SPEC_FROM_PLAN_PROMPT.format(spec=spec_content),
+        )
+        self._write_brainstorm_doc(
+            code_service,
+            "todo.md",
+            CREATE_TODO_LIST_PROMPT.format(plan=plan_content),
+        )
 
         code_service._create_commit("Add spec, plan, and todo list")
         code_service._sync_git_changes()
 
+    def _write_brainstorm_doc(
+        self, code_service: CodeService, filename: str, prompt: str
+    ) -> str:
+        """Have the reasoning model write a doc, add it to the repo and return it."""
+        content, reasoning = send_prompt_to_reasoning_model(
+            prompt, on_answer_chunk=self._get_answer_progress_logger(filename)
+        )
+        print(f"Received {filename} content: {content}\nReasoning: {reasoning}")
+        code_service._add_file_to_repo_dir(filename, content)
+        return content
+
+    def _get_answer_progress_logger(self, doc_name: str):
+        """Log to the job once the reasoning model starts writing its answer."""
+        has_started = False
+
+        def log_progress(chunk: str):
+            nonlocal has_started
+            if has_started or not chunk.strip():
+                return
+            has_started = True
+            self._log(f"Finished reasoning, writing {doc_name}")
+
+        return log_progress
+
     def _setup_github_repo(self):
         self._log("Creating GitHub repository")
         self.github_api = GithubApi(
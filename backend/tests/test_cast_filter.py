@@ -0,0 +1,40 @@
+from unittest import mock
+
+from backend import config
+from backend.services import cast_filter
+
+CAST = {"hash": "0xabc", "author": {"fid": 42}, "text": "build a frame"}
+
+
+def get_rejection(project_count):
+    with (
+        mock.patch.object(
+            cast_filter,
+            "get_openrank_score_for_fid",
+            return_value={"fid": 42, "percentile": 95},
+        ),
+        mock.patch.object(
+            cast_filter, "increment_counter", return_value=project_count
+        ) as increment,
+        mock.patch.object(cast_filter, "decrement_counter") as decrement,
+    ):
+        rejection = cast_filter.get_cast_rejection(CAST)
+    return rejection, increment, decrement
+
+
+def test_accepted_cast_reserves_a_project():
+    rejection, increment, decrement = get_rejection(1)
+
+    assert rejection is None
+    increment.assert_called_once_with(
+        cast_filter.get_cast_project_counter_key(42),
+        config.CAST_PROJECTS["RATE_LIMIT_WINDOW"],
+    )
+    decrement.assert_not_called()
+
+
+def test_rate_limited_cast_gives_its_reservation_back():
+    rejection, _, decrement = get_rejection(config.CAST_PROJECTS["MAX_PER_FID"] + 1)
+
+    assert "limit" in rejection
+    decrement.assert_called_once_with(cast_filter.get_cast_project_counter_key(42))
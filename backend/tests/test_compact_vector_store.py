@@ -0,0 +1,34 @@
+from backend.services.compact_vector_store import CompactVectorStore
+
+NODES = [
+    {"id": "a", "text": "cast search", "metadata": {"file_name": "a.md"}},
+    {"id": "b", "text": "user lookup", "metadata": {"file_name": "b.md"}},
+    {"id": "c", "text": "feed", "metadata": {"file_name": "c.md"}},
+]
+EMBEDDINGS = [[1.0, 0.0], [0.0, 2.0], [1.0, 1.0]]
+
+
+def test_query_returns_top_k_by_cosine_similarity():
+    store = CompactVectorStore.from_embeddings(EMBEDDINGS, NODES)
+
+    results = store.query([0.0, 1.0], top_k=2)
+
+    assert [node["id"] for _, node in results] == ["b", "c"]
+    assert results[0][0] == 1.0
+
+
+def test_persist_and_load_round_trip(tmp_path):
+    CompactVectorStore.from_embeddings(EMBEDDINGS, NODES).persist(str(tmp_path))
+
+    store = CompactVectorStore.load(str(tmp_path))
+
+    assert store.nodes == NODES
+    assert store.query([1.0, 0.0], top_k=1)[0][1]["id"] == "a"
+
+
+def test_query_only_scores_given_rows():
+    store = CompactVectorStore.from_embeddings(EMBEDDINGS, NODES)
+
+    results = store.query([0.0, 1.0], top_k=2, rows=[0, 2])
+
+    assert [node["id"] for _, node in results] == ["c", "a"]
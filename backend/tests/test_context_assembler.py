@@ -0,0 +1,88 @@
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from backend.services import context_assembler
+from backend.services.context_assembler import ContextAssembler
+
+
+def make_node(text: str, score: float, file_path: str = "") -> NodeWithScore:
+    metadata = {"file_path": file_path} if file_path else {}
+    return NodeWithScore(node=TextNode(text=text, metadata=metadata), score=score)
+
+
+def whitespace_tokenizer(text: str):
+    return text.split()
+
+
+def test_assemble_ranks_and_trims_overlap_of_neighbouring_chunks():
+    assembler = ContextAssembler(max_tokens=100, tokenizer=whitespace_tokenizer)
+    overlap = "Both chunks contain this sentence about casts."
+
+    context = assembler.assemble(
+        [
+            make_node(f"{overlap}\nGET /casts returns casts.", 0.5, "neynar/casts.md"),
+            make_node(
+                f"POST /cast publishes a cast.\n{overlap}", 0.9, "neynar/casts.md"
+            ),
+            make_node(
+                f"POST /cast publishes a cast.\n{overlap}", 0.4, "neynar/casts.md"
+            ),
+            make_node(overlap, 0.3, "neynar/other.md"),
+        ]
+    )
+
+    assert context == (
+        f"POST /cast publishes a cast.\n{overlap}"
+        "\n\nGET /casts returns casts."
+        f"\n\n{overlap}"
+    )
+
+
+def test_assemble_keeps_repeated_lines_of_yaml_schemas():
+    assembler = ContextAssembler(max_tokens=1000, tokenizer=whitespace_tokenizer)
+    schema = """## Response
+```yaml
+type: object
+properties:
+  fid:
+    type: integer
+  username:
+    type: string
+  display_name:
+    type: string
+  profile:
+    type: object
+    properties:
+      bio:
+        type: string
+```"""
+    other_schema = """## Request Body
+```yaml
+type: object
+properties:
+  text:
+    type: string
+```"""
+
+    context = assembler.assemble(
+        [
+            make_node(schema, 0.9, "neynar/neynar_lookupUser.md"),
+            make_node(other_schema, 0.8, "neynar/neynar_publishCast.md"),
+        ]
+    )
+
+    assert context == f"{schema}\n\n{other_schema}"
+
+
+def test_assemble_truncates_to_token_budget(monkeypatch):
+    monkeypatch.setattr(context_assembler, "MIN_TRUNCATED_CHUNK_TOKENS", 2)
+    assembler = ContextAssembler(max_tokens=6, tokenizer=whitespace_tokenizer)
+
+    context = assembler.assemble(
+        [
+            make_node("one two three", 0.9),
+            make_node("four five\nsix seven\neight nine", 0.8),
+            make_node("ten", 0.1),
+        ]
+    )
+
+    assert context == "one two three\n\nfour five\n\nten"
@@ -1,6 +1,7 @@
 import pytest
 from unittest import mock
 from backend.services.context_enhancer import CodeContextEnhancer
+from backend.services.compact_vector_store import CompactVectorStore
 
 
 @pytest.fixture
@@ -15,34 +16,56 @@ def mock_docs(tmp_path):
 
 
 def test_query_processing(mock_docs):
-    # Mock the query generation and engine responses
-    with mock.patch.object(
-        CodeContextEnhancer,
-        "_generate_queries",
-        return_value=["Dune API authentication", "Dune query execution methods"]
+    # Mock the query generation, embeddings and the stored vectors
+    compact_store = CompactVectorStore.from_embeddings(
+        [[1.0, 0.0], [0.0, 1.0]],
+        [
+            {
+                "id": "dune-docs",
+                "text": "Dune API documentation content",
+                "metadata": {"file_name": "dune_api.md"},
+            },
+            {
+                "id": "dune-auth",
+                "text": "Common Dune authentication methods",
+                "metadata": {"file_name": "dune_auth.md"},
+            },
+        ],
+    )
+    with mock.patch.multiple(
+        "backend.services.context_enhancer",
+        get_search_queries=mock.Mock(
+            return_value=["Dune API authentication", "Dune query execution methods"]
+        ),
+        get_query_embeddings=mock.Mock(return_value=[[0.0, 1.0], [1.0, 0.0]]),
+        load_compact_indexes=mock.Mock(return_value=(compact_store, None)),
     ):
-        # Create instance first
         enhancer = CodeContextEnhancer()
-        
-        # Now mock the query_engine on the instance
-        mock_engine = mock.Mock()
-        enhancer.query_engine = mock_engine
-        
-        # Setup mock response
-        mock_response = mock.Mock()
-        mock_response.source_nodes = [
-            mock.Mock(text="Dune API documentation content"),
-            mock.Mock(text="Common Dune authentication methods")
-        ]
-        mock_engine.query.return_value = mock_response
-        
+
         result = enhancer.get_relevant_context("How to query Dune API?")
-        
+
         assert "Dune API documentation content" in result
         assert "Common Dune authentication methods" in result
 
 
 def test_empty_query():
-    enhancer = CodeContextEnhancer()
+    compact_store = CompactVectorStore.from_embeddings(
+        [[1.0, 0.0]],
+        [{"id": "dune-docs", "text": "Dune API documentation", "metadata": {}}],
+    )
+    with mock.patch(
+        "backend.services.context_enhancer.load_compact_indexes",
+        return_value=(compact_store, None),
+    ):
+        enhancer = CodeContextEnhancer()
     result = enhancer.get_relevant_context("")
     assert result is None
+
+
+def test_missing_index_fails_loudly():
+    with mock.patch(
+        "backend.services.context_enhancer.load_compact_indexes",
+        return_value=(None, None),
+    ):
+        with pytest.raises(FileNotFoundError):
+            CodeContextEnhancer()
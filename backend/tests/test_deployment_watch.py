@@ -0,0 +1,96 @@
+from unittest import mock
+
+from backend.services import deployment_watch
+
+PENDING_DEPLOYMENT = {
+    "project_id": "project",
+    "job_id": "job",
+    "user_context": {"fid": 42},
+    "vercel_project_id": "prj_123",
+    "commit_sha": "abc123",
+}
+
+
+def watch(webhook_enabled, popped, wait_error=None):
+    with (
+        mock.patch.object(
+            deployment_watch, "is_vercel_webhook_enabled", return_value=webhook_enabled
+        ),
+        mock.patch.object(
+            deployment_watch, "pop_pending_deployment", return_value=popped
+        ) as pop,
+        mock.patch.object(deployment_watch, "finish_deployment") as finish,
+        mock.patch.object(
+            deployment_watch.VercelDeploymentPoller, "__init__", return_value=None
+        ),
+        mock.patch.object(
+            deployment_watch.VercelDeploymentPoller, "wait", side_effect=wait_error
+        ),
+    ):
+        deployment_watch.watch_deployment(PENDING_DEPLOYMENT)
+    return pop, finish
+
+
+def test_watcher_finishes_deployments_without_webhooks():
+    pop, finish = watch(webhook_enabled=False, popped=None)
+
+    pop.assert_not_called()
+    finish.assert_called_once_with(PENDING_DEPLOYMENT, error=None)
+
+
+def test_watcher_finishes_deployments_the_webhook_missed():
+    _, finish = watch(
+        webhook_enabled=True,
+        popped=PENDING_DEPLOYMENT,
+        wait_error=TimeoutError("Vercel build did not complete"),
+    )
+
+    finish.assert_called_once_with(
+        PENDING_DEPLOYMENT, error="Vercel build did not complete"
+    )
+
+
+def test_watcher_skips_deployments_finished_by_webhook():
+    pop, finish = watch(webhook_enabled=True, popped=None)
+
+    pop.assert_called_once_with("prj_123", "abc123")
+    finish.assert_not_called()
+
+
+def test_poller_stops_once_the_webhook_finished_the_deployment():
+    poller = object.__new__(deployment_watch.VercelDeploymentPoller)
+    poller.commit_sha = "abc123"
+    should_stop = mock.Mock(side_effect=[False, True])
+
+    with (
+        mock.patch.object(
+            poller, "_get_deployment", return_value={"readyState": "BUILDING"}
+        ) as get_deployment,
+        mock.patch.object(deployment_watch.time, "sleep"),
+    ):
+        assert poller.wait(600, should_stop=should_stop) is None
+
+    get_deployment.assert_called_once()
+
+
+def test_watcher_stops_polling_when_the_pending_deployment_is_gone():
+    with (
+        mock.patch.object(
+            deployment_watch, "is_vercel_webhook_enabled", return_value=True
+        ),
+        mock.patch.object(deployment_watch, "get_cached_json", return_value=None),
+        mock.patch.object(
+            deployment_watch, "pop_pending_deployment", return_value=None
+        ),
+        mock.patch.object(deployment_watch, "finish_deployment") as finish,
+        mock.patch.object(
+            deployment_watch.VercelDeploymentPoller, "__init__", return_value=None
+        ),
+        mock.patch.object(
+            deployment_watch.VercelDeploymentPoller, "wait", return_value=None
+        ) as wait,
+    ):
+        deployment_watch.watch_deployment(PENDING_DEPLOYMENT)
+        assert wait.call_args.kwargs["should_stop"]() is True
+
+    finish.assert_not_called()
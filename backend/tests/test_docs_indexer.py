@@ -0,0 +1,72 @@
+import pytest
+from backend.services.docs_indexer import IncrementalDocsIndexer
+
+
+class FakeEmbedModel:
+    def __init__(self):
+        self.embedded_texts = []
+
+    def get_text_embedding_batch(self, texts):
+        self.embedded_texts.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+@pytest.fixture
+def docs_dir(tmp_path):
+    docs = tmp_path / "docs"
+    (docs / "neynar").mkdir(parents=True)
+    (docs / "neynar" / "search-casts.md").write_text("Search casts endpoint")
+    (docs / "dune.md").write_text("Dune API docs")
+    return docs
+
+
+def create_indexer(docs_dir, embed_model):
+    return IncrementalDocsIndexer(
+        embed_model,
+        embedding_model_name="test-embedding",
+        docs_path=str(docs_dir),
+        index_path=str(docs_dir.parent / "index"),
+    )
+
+
+def test_only_changed_docs_are_embedded(docs_dir):
+    create_indexer(docs_dir, FakeEmbedModel()).update()
+    (docs_dir / "neynar" / "search-casts.md").write_text("Search casts endpoint v2")
+
+    embed_model = FakeEmbedModel()
+    store = create_indexer(docs_dir, embed_model).update()
+
+    assert len(embed_model.embedded_texts) == 1
+    assert "Search casts endpoint v2" in embed_model.embedded_texts[0]
+    assert sorted(node["metadata"]["file_name"] for node in store.nodes) == [
+        "dune.md",
+        "search-casts.md",
+    ]
+
+
+def test_removed_docs_are_dropped(docs_dir):
+    create_indexer(docs_dir, FakeEmbedModel()).update()
+    (docs_dir / "dune.md").unlink()
+
+    embed_model = FakeEmbedModel()
+    store = create_indexer(docs_dir, embed_model).update()
+
+    assert embed_model.embedded_texts == []
+    assert [node["metadata"]["file_name"] for node in store.nodes] == [
+        "search-casts.md"
+    ]
+    assert store.embeddings.shape == (1, 2)
+
+
+def test_front_matter_becomes_node_metadata(docs_dir):
+    (docs_dir / "neynar" / "neynar_lookupCast.md").write_text(
+        "---\nmethod: GET\npath: /v2/farcaster/cast\ntags: [Cast, Lookup]\n---\n"
+        "# lookupCast\n"
+    )
+
+    store = create_indexer(docs_dir, FakeEmbedModel()).update()
+
+    node = next(n for n in store.nodes if n["text"] == "# lookupCast")
+    assert node["metadata"]["api"] == "neynar"
+    assert node["metadata"]["method"] == "GET"
+    assert node["metadata"]["tags"] == "Cast, Lookup"
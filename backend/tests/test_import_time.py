@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+# cumulative import time budgets, generous enough for slow CI machines
+IMPORT_TIME_BUDGETS_SECONDS = {
+    # imported by every webhook container at startup
+    "backend.types": 1.0,
+    "backend.services.cast_filter": 1.5,
+    "backend.integrations.farcaster_notifications": 1.5,
+    # the web endpoints, imported by every Modal container of the app
+    "backend.main": 3.0,
+    # the context container, llama-index dominates
+    "backend.services.context_enhancer": 8.0,
+}
+
+# must only be imported by the code paths that use them
+HEAVY_MODULES = ["aider", "git", "llama_index", "numpy", "openai", "playwright"]
+WEBHOOK_MODULES = ["backend.types", "backend.services.cast_filter", "backend.main"]
+
+
+def profile_import(module: str):
+    """Import a module in a fresh interpreter with -X importtime.
+
+    Returns the cumulative import time in seconds and all imported module names.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=REPO_ROOT,
+        env={
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join(
+                [REPO_ROOT, os.environ.get("PYTHONPATH", "")]
+            ),
+            # containers don't scan for local packages to mount, only `modal deploy` does
+            "MODAL_AUTOMOUNT": "0",
+        },
+    )
+    if result.returncode != 0:
+        pytest.fail(f"importing {module} failed:\n{result.stderr}", pytrace=False)
+
+    cumulative_seconds = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:") :].split("|")
+        cumulative_seconds[name.strip()] = int(cumulative_us) / 1_000_000
+    return cumulative_seconds[module], set(cumulative_seconds)
+
+
+@pytest.mark.parametrize("module,budget", IMPORT_TIME_BUDGETS_SECONDS.items())
+def test_import_time_within_budget(module, budget):
+    import_seconds, _ = profile_import(module)
+
+    assert import_seconds < budget
+
+
+@pytest.mark.parametrize("module", WEBHOOK_MODULES)
+def test_webhook_modules_do_not_import_heavy_dependencies(module):
+    _, imported_modules = profile_import(module)
+
+    assert not imported_modules & set(HEAVY_MODULES)
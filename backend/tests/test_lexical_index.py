@@ -0,0 +1,22 @@
+from backend.services.lexical_index import BM25Index, reciprocal_rank_fusion
+
+NODES = [
+    {"id": "a", "text": "Fetch bulk casts by hash", "metadata": {}},
+    {"id": "b", "text": "operationId: fetchBulkUsers", "metadata": {}},
+    {"id": "c", "text": "Publish a cast to the feed", "metadata": {}},
+]
+
+
+def test_query_matches_exact_identifier(tmp_path):
+    BM25Index.from_nodes(NODES).persist(str(tmp_path))
+    index = BM25Index.load(str(tmp_path))
+
+    results = index.query("fetchBulkUsers", top_k=2)
+
+    assert results[0][1] == 1
+
+
+def test_reciprocal_rank_fusion_prefers_ids_ranked_by_both():
+    fused = reciprocal_rank_fusion([["a", "b"], ["b", "c"]], k=60)
+
+    assert [item_id for item_id, _ in fused] == ["b", "a", "c"]
@@ -0,0 +1,34 @@
+from backend.integrations.llm import ThinkBlockSplitter
+
+
+def split_stream(chunks):
+    splitter = ThinkBlockSplitter()
+    segments = []
+    for chunk in chunks:
+        segments.extend(splitter.feed(chunk))
+    segments.extend(splitter.flush())
+
+    reasoning = "".join(text for is_reasoning, text in segments if is_reasoning)
+    answer = "".join(text for is_reasoning, text in segments if not is_reasoning)
+    return answer, reasoning
+
+
+def test_splits_think_block_from_answer():
+    answer, reasoning = split_stream(["<think>plan it</think>", "the answer"])
+
+    assert reasoning == "plan it"
+    assert answer == "the answer"
+
+
+def test_handles_tags_split_across_chunks():
+    answer, reasoning = split_stream(["<th", "ink>plan", " it</th", "in", "k>ans", "wer"])
+
+    assert reasoning == "plan it"
+    assert answer == "answer"
+
+
+def test_output_without_think_block_is_answer():
+    answer, reasoning = split_stream(["just an ", "answer with a < sign"])
+
+    assert reasoning == ""
+    assert answer == "just an answer with a < sign"
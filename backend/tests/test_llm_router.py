@@ -0,0 +1,27 @@
+import pytest
+from backend.integrations.llm_router import LlmRouter
+
+ROUTES = {"TEST": [("deepseek", "primary-model"), ("openai", "fallback-model")]}
+
+
+@pytest.fixture(autouse=True)
+def provider_keys(monkeypatch):
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "test")
+    monkeypatch.setenv("REAL_OPENAI_API_KEY", "test")
+
+
+def test_fails_over_to_next_provider():
+    def request(client, model):
+        if model == "primary-model":
+            raise Exception("provider outage")
+        return model
+
+    assert LlmRouter(routes=ROUTES).call("TEST", request) == "fallback-model"
+
+
+def test_prefers_healthy_provider_after_errors():
+    router = LlmRouter(routes=ROUTES)
+    for _ in range(5):
+        router._get_stats(("deepseek", "primary-model")).record(1, False)
+
+    assert router.get_ranked_candidates("TEST")[0] == ("openai", "fallback-model")
@@ -0,0 +1,51 @@
+import threading
+from unittest import mock
+
+from backend.integrations import openrank
+from backend.integrations.openrank import OpenRankBatcher
+
+
+def make_response(fids):
+    response = mock.Mock(ok=True)
+    response.json.return_value = {
+        "result": [{"fid": fid, "percentile": 95} for fid in fids]
+    }
+    return response
+
+
+def test_concurrent_lookups_are_sent_in_one_request():
+    batcher = OpenRankBatcher(window_seconds=0.1)
+    results = {}
+
+    def lookup(fid):
+        results[fid] = batcher.get_score(fid)
+
+    with (
+        mock.patch.object(openrank, "set_cached_json"),
+        mock.patch.object(
+            openrank.requests,
+            "post",
+            side_effect=lambda url, json, timeout: make_response(json),
+        ) as post,
+    ):
+        threads = [threading.Thread(target=lookup, args=(fid,)) for fid in (1, 2, 3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert post.call_count == 1
+    assert sorted(post.call_args.kwargs["json"]) == [1, 2, 3]
+    assert results[2] == {"fid": 2, "percentile": 95}
+
+
+def test_falls_back_to_last_known_score():
+    stale_score = {"score": {"fid": 1, "percentile": 91}, "fetched_at": 0}
+
+    with (
+        mock.patch.object(openrank, "get_cached_json", return_value=stale_score),
+        mock.patch.object(
+            openrank.requests, "post", side_effect=openrank.requests.Timeout()
+        ),
+    ):
+        assert openrank.get_openrank_score_for_fid(1) == {"fid": 1, "percentile": 91}
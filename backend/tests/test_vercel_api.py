@@ -0,0 +1,20 @@
+import re
+
+from backend.integrations.vercel_api import get_project_domain
+
+DNS_LABEL = re.compile(r"^[a-z0-9]([a-z0-9-]{0,61}[a-z0-9])?$")
+
+
+def test_project_domain_is_a_single_valid_dns_label():
+    domain = get_project_domain("dwr.eth__Weather_Frame")
+
+    assert domain == "dwr-eth-weather-frame-frameception.vercel.app"
+
+
+def test_unique_domain_of_a_long_name_fits_a_dns_label():
+    domain = get_project_domain("v." * 40 + "frame_", unique_suffix="1a2b3c4d")
+
+    label, rest = domain.split(".", 1)
+    assert rest == "vercel.app"
+    assert DNS_LABEL.match(label)
+    assert label.endswith("-1a2b3c4d-frameception")
@@ -1,4 +1,6 @@
-from typing import Optional, TypedDict
+from typing import List, Optional, TypedDict
+
+from pydantic import BaseModel, ConfigDict
 
 
 class UserContext(TypedDict):
@@ -7,3 +9,45 @@ class UserContext(TypedDict):
     displayName: Optional[str]
     pfpUrl: Optional[str]
     location: Optional[dict]
+
+
+class WebhookUserContext(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    fid: int
+
+
+class CreateProjectRequest(BaseModel):
+    # extra fields are kept, the whole request is stored as job data
+    model_config = ConfigDict(extra="allow")
+
+    prompt: str
+    user_context: WebhookUserContext
+    # repeat requests with the same key return the first project instead
+    idempotency_key: Optional[str] = None
+    # only retrieve docs of these APIs (e.g. ["neynar"]) for the spec, all if None
+    apis: Optional[List[str]] = None
+
+
+class UpdateCodeRequest(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    prompt: str
+    project_id: str
+    user_context: WebhookUserContext
+
+
+class DeployProjectRequest(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    project_id: str
+    user_context: WebhookUserContext
+
+
+class FarcasterWebhookEvent(BaseModel):
+    """Neynar webhook event, only the fields used for routing are validated."""
+
+    model_config = ConfigDict(extra="allow")
+
+    type: str
+    data: dict = {}
@@ -1,7 +1,10 @@
 import os
+import functools
 
 
+@functools.lru_cache(maxsize=1)
 def setup_sentry():
+    """Initialize Sentry, only once per container however often it's called."""
     import sentry_sdk
 
     SENTRY_DSN = os.environ.get("SENTRY_DSN")
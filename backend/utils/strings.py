@@ -8,3 +8,9 @@ def sanitize_project_name(name: str) -> str:
     sanitized = re.sub(r"[^a-z0-9._-]", "-", name)
     sanitized = re.sub(r"-+", "-", sanitized).strip("-")
     return sanitized.replace("---", "-")[:100]
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize a prompt so trivially different phrasings share a cache key"""
+    normalized = re.sub(r"[^\w\s]", " ", prompt.lower())
+    return re.sub(r"\s+", " ", normalized).strip()
@@ -1,45 +1,175 @@
 import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 import yaml
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Set, Tuple
 
 OUTPUT_PATH = "backend/llm_context/docs"  # Path to write the generated context files
+SOURCES_MANIFEST = "backend/llm_context/sources.yaml"  # Docs sources to ingest
 
+# libyaml bindings are much faster for large specs, fall back if not compiled in
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+YAML_DUMPER_BASE = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
 
-def resolve_schema(schema: Dict, spec: Dict) -> Dict:
-    """Resolve $ref references to actual schema components recursively"""
-    if "$ref" in schema:
-        ref_path = schema["$ref"].split("/")[-1]
-        resolved = spec["components"]["schemas"].get(ref_path, schema)
-        return resolve_schema(resolved, spec)  # Recurse on resolved schema
-    
-    # Handle nested object properties
-    if "properties" in schema:
-        for prop_name, prop_schema in schema["properties"].items():
-            schema["properties"][prop_name] = resolve_schema(prop_schema, spec)
-    
-    # Handle array items
-    if "items" in schema:
-        schema["items"] = resolve_schema(schema["items"], spec)
-    
-    # Handle anyOf/allOf/oneOf
-    for union_type in ["anyOf", "allOf", "oneOf"]:
-        if union_type in schema:
-            schema[union_type] = [resolve_schema(s, spec) for s in schema[union_type]]
-    
-    return schema
+
+class ContextYamlDumper(YAML_DUMPER_BASE):
+    # resolved components are shared between schemas, never emit &id001 aliases
+    def ignore_aliases(self, data):
+        return True
+
+
+class SchemaResolver:
+    """Resolves $ref references to schema components without mutating the spec.
+
+    Each component is resolved once and reused. A reference back to a component
+    that is already being resolved (a recursive schema) is left as a $ref.
+    """
+
+    def __init__(self, spec: Dict):
+        self.components = spec.get("components", {}).get("schemas", {})
+        self.resolved_components: Dict[str, Dict] = {}
+
+    def resolve(self, schema: Dict) -> Dict:
+        resolved, _ = self._resolve(schema, [])
+        return resolved
+
+    def _resolve(self, schema, stack: List[str]) -> Tuple[Dict, Set[str]]:
+        """Resolved schema and the components it left unresolved due to cycles."""
+        if not isinstance(schema, dict):
+            return schema, set()
+
+        if "$ref" in schema:
+            ref_name = schema["$ref"].split("/")[-1]
+            if ref_name not in self.components:
+                return schema, set()
+            if ref_name in stack:
+                return schema, {ref_name}
+            if ref_name in self.resolved_components:
+                return self.resolved_components[ref_name], set()
+
+            resolved, cycles = self._resolve(
+                self.components[ref_name], stack + [ref_name]
+            )
+            cycles.discard(ref_name)
+            # only cache results that don't depend on where the ref was reached from
+            if not cycles:
+                self.resolved_components[ref_name] = resolved
+            return resolved, cycles
+
+        resolved = dict(schema)
+        cycles = set()
+
+        # Handle nested object properties
+        if isinstance(schema.get("properties"), dict):
+            resolved["properties"] = {}
+            for prop_name, prop_schema in schema["properties"].items():
+                resolved_prop, prop_cycles = self._resolve(prop_schema, stack)
+                resolved["properties"][prop_name] = resolved_prop
+                cycles |= prop_cycles
+
+        # Handle array items
+        if "items" in schema:
+            resolved["items"], item_cycles = self._resolve(schema["items"], stack)
+            cycles |= item_cycles
+
+        # Handle anyOf/allOf/oneOf
+        for union_type in ["anyOf", "allOf", "oneOf"]:
+            if union_type in schema:
+                resolved[union_type] = []
+                for sub_schema in schema[union_type]:
+                    resolved_sub, sub_cycles = self._resolve(sub_schema, stack)
+                    resolved[union_type].append(resolved_sub)
+                    cycles |= sub_cycles
+
+        return resolved, cycles
+
+
+def load_openapi_spec(openapi_file: str) -> Dict:
+    with open(openapi_file, "r") as f:
+        return yaml.load(f, Loader=YAML_LOADER)
+
+
+# set in each worker process by _init_worker, so the spec is sent once per worker
+worker_resolver: Optional[SchemaResolver] = None
+
+
+def _init_worker(spec: Dict) -> None:
+    global worker_resolver
+    worker_resolver = SchemaResolver(spec)
+
+
+def _render_operation_in_worker(operation: Tuple[str, str, str, Dict]) -> str:
+    api_name, path, method, details = operation
+    return render_operation(api_name, path, method, details, worker_resolver)
+
+
+def render_operation(
+    api_name: str, path: str, method: str, details: Dict, resolver: SchemaResolver
+) -> str:
+    """Markdown context doc for a single API operation.
+
+    The front matter becomes node metadata in the docs index, usable as
+    retrieval filters.
+    """
+    front_matter = {
+        "api": api_name,
+        "method": method.upper(),
+        "path": path,
+        "operation_id": details["operationId"],
+        "tags": details.get("tags", []),
+    }
+    content = "---\n"
+    content += yaml.dump(front_matter, Dumper=ContextYamlDumper, sort_keys=False)
+    content += "---\n"
+    content += f"# {details['operationId']}\n\n"
+    content += f"**Endpoint**: `{method.upper()} {path}`\n\n"
+
+    if "description" in details:
+        content += f"## Description\n{details['description']}\n\n"
+
+    if "parameters" in details:
+        content += "## Parameters\n"
+        for param in details["parameters"]:
+            # Skip parameters that are references without inline names
+            if "name" not in param:
+                continue
+            content += f"- `{param['name']}` ({param.get('in', 'query')}): {param.get('description', 'No description')}\n"
+        content += "\n"
+
+    if "responses" in details:
+        content += "## Response\n"
+        success_response = details["responses"].get("200", {})
+        if "content" in success_response:
+            schema = success_response["content"]["application/json"]["schema"]
+            resolved_schema = resolver.resolve(schema)
+            content += "```yaml\n"
+            content += yaml.dump(
+                resolved_schema, Dumper=ContextYamlDumper, sort_keys=False
+            )
+            content += "```\n"
+
+    return content
 
 
 def convert_openapi_to_llm_context(
-    openapi_file: str, api_name: str, additional_skip_words: Optional[List[str]] = None
+    openapi_file: str,
+    api_name: str,
+    additional_skip_words: Optional[List[str]] = None,
+    max_workers: Optional[int] = None,
 ) -> None:
     """Convert OpenAPI spec to LLM context documentation.
 
+    Operations are rendered in a process pool and only docs whose content
+    changed are written, so unchanged docs keep their mtime and hash. Docs
+    generated for operations that are no longer in the spec are removed.
+
     Args:
         openapi_file: Path to OpenAPI spec file (YAML)
         api_name: Name of API for grouping context files
         additional_skip_words: Optional list of additional words to skip
+        max_workers: Number of worker processes, defaults to the CPU count
 
     Example:
         convert_openapi_to_llm_context('neynar_openapi.yaml', 'neynar', ['temp','demo'])
@@ -56,8 +186,7 @@ def convert_openapi_to_llm_context(
         skip_filter += additional_skip_words
 
     try:
-        with open(openapi_file, "r") as f:
-            spec = yaml.safe_load(f)
+        spec = load_openapi_spec(openapi_file)
     except FileNotFoundError:
         print(f"Error: OpenAPI file not found at {openapi_file}")
         return
@@ -65,10 +194,10 @@ def convert_openapi_to_llm_context(
     output_dir = Path(OUTPUT_PATH) / api_name
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    items = spec.get("paths", {}).items()
-    for path, methods in tqdm(items, desc="Generating context files"):
+    operations = []
+    for path, methods in spec.get("paths", {}).items():
         for method, details in methods.items():
-            if "operationId" not in details:
+            if not isinstance(details, dict) or "operationId" not in details:
                 continue
 
             # Skip test/example endpoints
@@ -79,51 +208,108 @@ def convert_openapi_to_llm_context(
                 for skip_word in skip_filter
             ):
                 continue
+            operations.append((api_name, path, method, details))
 
-            # Generate context content
-            content = f"# {details['operationId']}\n\n"
-            content += f"**Endpoint**: `{method.upper()} {path}`\n\n"
-
-            if "description" in details:
-                content += f"## Description\n{details['description']}\n\n"
-
-            if "parameters" in details:
-                content += "## Parameters\n"
-                for param in details["parameters"]:
-                    # Skip parameters that are references without inline names
-                    if "name" not in param:
-                        continue
-                    content += f"- `{param['name']}` ({param.get('in', 'query')}): {param.get('description', 'No description')}\n"
-                content += "\n"
-
-            if "responses" in details:
-                content += "## Response\n"
-                success_response = details["responses"].get("200", {})
-                if "content" in success_response:
-                    schema = success_response["content"]["application/json"]["schema"]
-                    resolved_schema = resolve_schema(schema, spec)
-                    content += "```yaml\n"
-                    content += yaml.dump(resolved_schema, sort_keys=False)
-                    content += "```\n"
-
-            # Write context file
+    max_workers = max_workers or os.cpu_count() or 1
+    chunksize = max(1, len(operations) // (max_workers * 4))
+    written_count = 0
+    generated_files = set()
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_init_worker, initargs=(spec,)
+    ) as executor:
+        contents = executor.map(
+            _render_operation_in_worker, operations, chunksize=chunksize
+        )
+        for (_, _, _, details), content in tqdm(
+            zip(operations, contents),
+            total=len(operations),
+            desc="Generating context files",
+        ):
             filename = f"{api_name}_{details['operationId']}.md"
-            output_path = output_dir / filename
+            generated_files.add(filename)
+            if _write_if_changed(output_dir / filename, content):
+                written_count += 1
+
+    # generated docs are named {api_name}_*.md, anything else is hand-written
+    removed_count = 0
+    for doc in output_dir.glob(f"{api_name}_*.md"):
+        if doc.name not in generated_files:
+            doc.unlink()
+            removed_count += 1
+
+    print(
+        f"{written_count} of {len(operations)} context files written, "
+        f"{len(operations) - written_count} unchanged, {removed_count} stale removed"
+    )
+
+
+def _write_if_changed(output_path: Path, content: str) -> bool:
+    """Write the file unless it already has this content. Returns whether it wrote."""
+    try:
+        if output_path.exists() and output_path.read_text() == content:
+            return False
+        with open(output_path, "w") as f:
+            f.write(content)
+        return True
+    except IOError as e:
+        print(f"Error writing file {output_path}: {str(e)}")
+        return False
+
 
-            try:
-                with open(output_path, "w") as f:
-                    f.write(content)
-                # print(f"Created context file: {output_path}")
-            except IOError as e:
-                print(f"Error writing file {output_path}: {str(e)}")
+def copy_markdown_docs(source_dir: str, api_name: str) -> None:
+    """Copy markdown docs into the context docs of an API, if they live elsewhere."""
+    output_dir = Path(OUTPUT_PATH) / api_name
+    source = Path(source_dir)
+    if source.resolve() == output_dir.resolve():
+        return
+    if not source.is_dir():
+        print(f"Error: markdown docs not found at {source_dir}")
+        return
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    copied_count = 0
+    for doc in sorted(source.glob("*.md")):
+        output_path = output_dir / doc.name
+        if output_path.exists() and output_path.read_bytes() == doc.read_bytes():
+            continue
+        shutil.copyfile(doc, output_path)
+        copied_count += 1
+    print(f"{copied_count} markdown docs copied from {source_dir} for {api_name}")
+
+
+def ingest_sources(manifest_path: str = SOURCES_MANIFEST) -> None:
+    """Generate the context docs of every source declared in the manifest.
+
+    Each source has an `api` name (its docs directory and retrieval filter
+    value) and a `type`: `openapi` with a `spec` file and optional
+    `skip_words`, or `markdown` with a `path` to a directory of docs.
+    """
+    with open(manifest_path) as f:
+        sources = yaml.load(f, Loader=YAML_LOADER)["sources"]
+
+    for source in sources:
+        print(f"Ingesting {source['type']} source for {source['api']}")
+        if source["type"] == "openapi":
+            convert_openapi_to_llm_context(
+                source["spec"], source["api"], source.get("skip_words")
+            )
+        elif source["type"] == "markdown":
+            copy_markdown_docs(source["path"], source["api"])
+        else:
+            print(f"Error: unknown source type {source['type']}")
 
 
 def main():
-    openapi_file = "notebooks/specs/Neynar_OAS_v2_spec.yaml"
-    api_name = "neynar"
-    additional_skip_words = ["temp", "demo", "signer", "delete", "webhook"]
-    convert_openapi_to_llm_context(openapi_file, api_name, additional_skip_words)
+    ingest_sources()
+
+    # imported here as it needs the embedding API key
+    from backend.services.context_enhancer import update_docs_index
+
+    update_docs_index()
 
 
 if __name__ == "__main__":
     main()
+
+# run with
+# PYTHONPATH=$PYTHONPATH:. python scripts/convert_openapi_to_llm_context.py
@@ -1,7 +1,19 @@
-from backend.services.context_enhancer import CodeContextEnhancer
+import sys
 
-e = CodeContextEnhancer()
-e.refresh_persisted_index()
+# only new or changed docs are embedded, tracked in the manifest.json of the index
+if "--local" in sys.argv:
+    # into backend/llm_context/compact_index, for running the backend locally
+    from backend.services.context_enhancer import update_docs_index
+
+    update_docs_index()
+else:
+    # into the context index volume of the deployed app, deploy doc changes first
+    import modal
+    from backend import config
+
+    modal.Function.lookup(
+        config.APP_NAME, config.MODAL_UPDATE_CONTEXT_INDEX_FUNCTION_NAME
+    ).remote()
 
 # run with
-# PYTHONPATH=$PYTHONPATH:. python scripts/update_docs_index.py
+# PYTHONPATH=$PYTHONPATH:. python scripts/update_docs_index.py [--local]
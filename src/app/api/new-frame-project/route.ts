@@ -13,7 +13,7 @@ export async function POST(req: NextRequest) {
   try {
     // Get request body
     const body = await req.json();
-    const { prompt, userContext } = body;
+    const { prompt, userContext, idempotencyKey, apis } = body;
 
     // Validate required fields
     if (!prompt || !userContext) {
@@ -31,7 +31,9 @@ export async function POST(req: NextRequest) {
       },
       body: JSON.stringify({
         prompt,
-        user_context: userContext
+        user_context: userContext,
+        idempotency_key: idempotencyKey ?? req.headers.get('idempotency-key') ?? undefined,
+        apis,
       })
     });
 
@@ -111,7 +111,8 @@ function ProjectInfoCard({
           <ProjectStatusIndicator status={projectStatus} />
         </div>
         <div className="flex flex-col sm:flex-row gap-3">
-          {projectStatus.state === "created" && (
+          {(projectStatus.state === "created" ||
+            project.status === "deploy_failed") && (
             <Button
               onClick={onHandleDeploy}
               className="flex-1 w-full"
@@ -119,7 +120,7 @@ function ProjectInfoCard({
               disabled={isSubmitting}
             >
               <Play className="w-4 h-4 mr-2" />
-              Deploy Now
+              {projectStatus.state === "created" ? "Deploy Now" : "Deploy Again"}
             </Button>
           )}
           {project.frontend_url && (
@@ -1,3 +1,4 @@
+import { useRef } from "react";
 import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
 import type { FrameContext, Project } from "~/lib/types";
 
@@ -16,17 +17,24 @@ export function useProjects(fid?: number) {
     enabled: !!fid,
   });
 
+  // one idempotency key per submitted prompt, reused when a failed submit is retried
+  const pendingSubmit = useRef<{ prompt: string; idempotencyKey: string } | null>(null);
+
   const createProjectMutation = useMutation({
     mutationFn: async (payload: { prompt: string; userContext: FrameContext["user"] }) => {
+      if (pendingSubmit.current?.prompt !== payload.prompt) {
+        pendingSubmit.current = { prompt: payload.prompt, idempotencyKey: crypto.randomUUID() };
+      }
       const response = await fetch("/api/new-frame-project", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(payload),
+        body: JSON.stringify({ ...payload, idempotencyKey: pendingSubmit.current.idempotencyKey }),
       });
       if (!response.ok) throw new Error("Failed to create project");
       return response.json();
     },
     onSuccess: () => {
+      pendingSubmit.current = null;
       queryClient.invalidateQueries({ queryKey: ["projects", fid] });
     },
   });
@@ -24,6 +24,12 @@ export function getMergedProjectStatus(project: Project | null): ProjectStatus {
   switch (project.status) {
     case 'created':
       return { state: 'created', message: 'Deploy to share with others' };
+    case 'deploy_failed':
+      return {
+        state: 'failed',
+        message: 'Deployment failed',
+        error: 'Vercel build failed, deploy again or fix the build errors'
+      };
     case 'failed':
       return {
         state: 'failed',